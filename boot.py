@@ -1,18 +1,19 @@
+from fd.bootTimeline import handOver, markPhase
+
+markPhase("boot")
+
 import storage
 import usb_cdc
 import usb_midi
 from board import *
 from digitalio import DigitalInOut, Pull
 
-# import configuration
-try:
-    from fd.config import config
-except ImportError:
-    print(
-        "Using default configuration (config_default.py). To use your own settings copy as config.py and modify to taste."
-    )
-    from fd.config_default import config
+# import configuration (missing settings are taken from config_default.py)
+from fd.configuration import loadConfig
+
+config = loadConfig()
 
+markPhase("config")
 
 # change the drive's label
 def changeDriveLabel(name):
@@ -39,6 +40,7 @@ print("--------------------------------")
 
 # change drive label
 changeDriveLabel(config["driveLabel"])
+markPhase("drive label")
 
 # check IO21 for stealth mode
 if isPinGrounded(IO21):
@@ -59,3 +61,9 @@ if isPinGrounded(IO21):
 else:
     # normal boot
     print("IO21 not grounded => USB drive enabled")
+
+markPhase("stealth")
+
+# hand the boot timeline over to main.py
+if config["bootTimeline"]["enabled"]:
+    handOver(config["bootTimeline"]["nvmOffset"])
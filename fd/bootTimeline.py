@@ -0,0 +1,196 @@
+import struct
+import time
+
+from fd.payloadStorage import writePayload
+
+try:
+    from microcontroller import nvm
+except ImportError:
+    nvm = None
+
+# timeline of the startup phases
+#  - every phase is marked once it's done, using time.monotonic_ns (time since the board started)
+#  - boot.py and main.py run in separate VMs: boot.py hands its phases over through microcontroller.nvm
+#  - the timelines of the last boots are kept in a ring stored in a file, or in microcontroller.nvm if the
+#    filesystem is read-only (USB drive mounted on the host)
+#  - layout (file and nvm alike): magic, handover record (boot.py), RING_SIZE records (oldest are overwritten)
+#    record: boot number (0 = empty), phase count, phases (phase code, milliseconds since start)
+
+PHASES = (
+    # boot.py
+    "boot",
+    "config",
+    "drive label",
+    "stealth",
+    # main.py
+    "main",
+    "main config",
+    "imports",
+    "display",
+    "usb",
+    "host",
+    "hid",
+    "locale",
+    "pins",
+    "first report",
+    "payload",
+    "web imports",
+    "web server",
+)
+
+RING_PATH = "fd/bootTimeline.bin"
+RING_SIZE = 4
+MAGIC = b"BT"
+RECORD_HEADER = "<HB"
+PHASE_ENTRY = "<BI"
+RECORD_SIZE = struct.calcsize(RECORD_HEADER) + len(PHASES) * struct.calcsize(PHASE_ENTRY)
+STORE_SIZE = len(MAGIC) + (1 + RING_SIZE) * RECORD_SIZE
+
+# phases of the current boot: (name, ns since start)
+phases = []
+
+
+def markPhase(name):
+    phases.append((name, time.monotonic_ns()))
+
+
+# phases with the time they were done at and how long they took (ms)
+def formatPhases(phaseList):
+    timeline = []
+    previous = 0
+    for name, at in phaseList:
+        timeline.append({"phase": name, "at": at // 1000000, "duration": (at - previous) // 1000000})
+        previous = at
+    return timeline
+
+
+def bootTimeline():
+    return formatPhases(phases)
+
+
+def printTimeline(output=print):
+    output("Boot timeline (ms since start):")
+    for entry in bootTimeline():
+        output(" - {:<12} {:>7} (+{})".format(entry["phase"], entry["at"], entry["duration"]))
+
+
+def packRecord(buffer, offset, number, phaseList):
+    phaseList = phaseList[: len(PHASES)]
+    struct.pack_into(RECORD_HEADER, buffer, offset, number, len(phaseList))
+    offset += struct.calcsize(RECORD_HEADER)
+    for name, at in phaseList:
+        struct.pack_into(PHASE_ENTRY, buffer, offset, PHASES.index(name), at // 1000000)
+        offset += struct.calcsize(PHASE_ENTRY)
+
+
+# record at offset: boot number and phases (name, ns since start)
+def unpackRecord(data, offset):
+    number, count = struct.unpack_from(RECORD_HEADER, data, offset)
+    offset += struct.calcsize(RECORD_HEADER)
+    phaseList = []
+    for i in range(min(count, len(PHASES))):
+        code, at = struct.unpack_from(PHASE_ENTRY, data, offset)
+        offset += struct.calcsize(PHASE_ENTRY)
+        if code < len(PHASES):
+            phaseList.append((PHASES[code], at * 1000000))
+    return number, phaseList
+
+
+def recordOffset(slot):
+    return len(MAGIC) + slot * RECORD_SIZE
+
+
+# stored handover record and ring (None if there's nothing valid stored)
+def readStore(useNvm, nvmOffset=0):
+    if useNvm:
+        if nvm is None or len(nvm) < nvmOffset + STORE_SIZE:
+            return None
+        data = bytearray(nvm[nvmOffset : nvmOffset + STORE_SIZE])
+    else:
+        try:
+            f = open(RING_PATH, "rb")
+            data = bytearray(f.read())
+            f.close()
+        except OSError:
+            return None
+    if len(data) != STORE_SIZE or data[: len(MAGIC)] != MAGIC:
+        return None
+    return data
+
+
+def emptyStore():
+    data = bytearray(STORE_SIZE)
+    data[: len(MAGIC)] = MAGIC
+    return data
+
+
+# the file can only be written while the filesystem is writable (see payloadStorage.openStorage)
+def writeStore(data, useNvm, nvmOffset=0):
+    if not useNvm:
+        return writePayload(RING_PATH, data)
+    if nvm is None or len(nvm) < nvmOffset + STORE_SIZE:
+        return False
+    nvm[nvmOffset : nvmOffset + STORE_SIZE] = data
+    return True
+
+
+# records of the ring (boot number, phases)
+def storedRecords(data):
+    records = []
+    if data is not None:
+        for slot in range(1, RING_SIZE + 1):
+            number, phaseList = unpackRecord(data, recordOffset(slot))
+            if number:
+                records.append((number, phaseList))
+    return records
+
+
+# boot.py: hand the phases marked so far over to main.py
+def handOver(nvmOffset=0):
+    data = readStore(True, nvmOffset) or emptyStore()
+    packRecord(data, recordOffset(0), 1, phases)
+    return writeStore(data, True, nvmOffset)
+
+
+# main.py: put the phases handed over by boot.py in front of its own
+#  - the handover is only consumed by saveTimeline, a soft reload (no boot.py) finds it empty
+def takeHandover(nvmOffset=0):
+    data = readStore(True, nvmOffset)
+    if data is None:
+        return
+    number, phaseList = unpackRecord(data, recordOffset(0))
+    if number:
+        for i, phase in enumerate(phaseList):
+            phases.insert(i, phase)
+
+
+# main.py: store the timeline of the current boot in the ring
+#  - writable: filesystem is writable (otherwise the ring in nvm is used)
+def saveTimeline(nvmOffset=0, writable=False):
+    nvmData = readStore(True, nvmOffset)
+    fileData = readStore(False)
+    number = 1
+    for n, phaseList in storedRecords(nvmData) + storedRecords(fileData):
+        number = max(number, n + 1)
+
+    data = (fileData if writable else nvmData) or emptyStore()
+    packRecord(data, recordOffset(1 + number % RING_SIZE), number, phases)
+    if writable:
+        if not writeStore(data, False):
+            return False
+        if nvmData is None:
+            return True
+    else:
+        nvmData = data
+
+    # consume the handover
+    struct.pack_into(RECORD_HEADER, nvmData, recordOffset(0), 0, 0)
+    return writeStore(nvmData, True, nvmOffset) or writable
+
+
+# timelines of the last boots (oldest first)
+def timelineHistory(nvmOffset=0):
+    records = {}
+    for number, phaseList in storedRecords(readStore(True, nvmOffset)) + storedRecords(readStore(False)):
+        records[number] = phaseList
+    return [{"boot": number, "phases": formatPhases(records[number])} for number in sorted(records)[-RING_SIZE:]]
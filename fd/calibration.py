@@ -0,0 +1,125 @@
+import json
+import time
+
+from fd.hidReports import EMPTY_KEYBOARD_REPORT, sendPaced
+from fd.logger import info
+
+# host profiles (calibration results) are stored in this file
+HOST_PROFILES_PATH = "fd/hostProfiles.json"
+
+
+# toggle a lock key several times in a row and count the LED state changes echoed by the host
+#  - device: HID keyboard device (anything providing send_report)
+#  - ledOn: function returning whether the given LED is currently lit on the host
+#  - every toggle has to show up as a change of the LED state, otherwise the host dropped keystrokes
+#    (the LED is polled between all reports, so echoes can't pile up unseen while toggling)
+#  - an echo missed anyway only makes the interval look unsafe, never the other way round
+#  - returns time (ns) between the last report and the last LED change or None if not all toggles were echoed in time
+def measureToggles(device, ledOn, keycode, ledCode, toggles, reportInterval, timeout):
+    state = ledOn(ledCode)
+    transitions = 0
+    report = bytearray(8)
+    report[2] = keycode
+
+    for i in range(toggles):
+        for r in (report, EMPTY_KEYBOARD_REPORT):
+            sendPaced(device, r, reportInterval)
+            if ledOn(ledCode) != state:
+                state = not state
+                transitions += 1
+    sent = time.monotonic_ns()
+    echoed = sent
+
+    timeout = sent + timeout
+    while transitions < toggles and time.monotonic_ns() < timeout:
+        if ledOn(ledCode) != state:
+            state = not state
+            transitions += 1
+            echoed = time.monotonic_ns()
+
+    if transitions != toggles:
+        return None
+    return echoed - sent
+
+
+# determine the fastest report interval the host reliably accepts
+#  - tries the provided intervals (nanoseconds) from slowest to fastest and stops at the first one dropping keystrokes
+#  - every interval is tested through several rounds of lock key toggles
+#  - the host's LED state is restored afterwards
+#  - returns dict with the best interval (multiplied by the safety factor) and the LED echo latency, or None if
+#    not even the slowest interval worked
+def calibrate(
+    device,
+    ledOn,
+    keycode,
+    ledCode,
+    intervals,
+    toggles=9,
+    rounds=3,
+    timeout=500000000,
+    safetyFactor=1.5,
+):
+    initialState = ledOn(ledCode)
+    best = None
+    latencies = []
+
+    for interval in sorted(intervals, reverse=True):
+        roundLatencies = []
+        for i in range(rounds):
+            latency = measureToggles(
+                device, ledOn, keycode, ledCode, toggles, interval, timeout
+            )
+            if latency is None:
+                break
+            roundLatencies.append(latency)
+
+        if len(roundLatencies) < rounds:
+            info(" -> {} us: keystrokes dropped", interval // 1000)
+            break
+
+        info(" -> {} us: ok (echo after {} us)", interval // 1000, max(roundLatencies) // 1000)
+        best = interval
+        latencies.extend(roundLatencies)
+
+    # restore LED state (toggle slowly until the host confirms it)
+    for i in range(rounds):
+        if ledOn(ledCode) == initialState:
+            break
+        measureToggles(
+            device, ledOn, keycode, ledCode, 1, max(intervals), timeout
+        )
+
+    if best is None:
+        return None
+
+    return {
+        "reportInterval": int(best * safetyFactor) // 1000,
+        "echoLatency": {
+            "min": min(latencies) // 1000,
+            "max": max(latencies) // 1000,
+        },
+    }
+
+
+# load all stored host profiles
+def loadHostProfiles(path=HOST_PROFILES_PATH):
+    try:
+        f = open(path, "r")
+        profiles = json.load(f)
+        f.close()
+        return profiles
+    except (OSError, ValueError):
+        return {}
+
+
+# store all host profiles (filesystem has to be writable)
+#  - returns True on success
+def saveHostProfiles(profiles, path=HOST_PROFILES_PATH):
+    try:
+        f = open(path, "w")
+        json.dump(profiles, f)
+        f.close()
+        return True
+    except OSError:
+        print("Error trying to write host profiles: ", path)
+        return False
@@ -0,0 +1,287 @@
+from fd.consumerControlCommands import consumerControlCommands
+from fd.duckyCommands import duckyCommands
+from fd.hidReports import buildKeyboardReport, convertStringToStrokes
+from fd.keyboardLeds import keyboardLeds
+from fd.keyboardLocales import loadLayout
+from fd.logger import warning
+from fd.mouseButtons import mouseButtons
+from fd.opcodes import (
+    OP_BLINKLED,
+    OP_CALIBRATE,
+    OP_CC_PRESS,
+    OP_CC_RELEASE,
+    OP_CC_SEND,
+    OP_DEFAULTDELAY,
+    OP_DELAY,
+    OP_HOSTPROFILE,
+    OP_IMPORT,
+    OP_KEYS,
+    OP_LED,
+    OP_LOCALE,
+    OP_MOUSE_CLICK,
+    OP_MOUSE_MOVE,
+    OP_MOUSE_PRESS,
+    OP_MOUSE_RELEASE,
+    OP_MOUSE_RELEASEALL,
+    OP_MOUSE_WHEEL,
+    OP_NOOP,
+    OP_PRINT,
+    OP_PSYCHOMOUSE,
+    OP_REPEAT,
+    OP_STRING,
+    OP_TYPINGINTERVAL,
+    OP_WAITFORLED,
+    OP_WAITFORWIFI,
+)
+
+
+# split string into list tokens and make 1st token UPPERCASE
+def splitToTokens(line):
+    tokens = line.split(" ")
+    tokens[0] = tokens[0].upper()
+    return tokens
+
+
+# join list of tokens to a string
+def joinTokens(tokens, start=0):
+    return " ".join(tokens[start:])
+
+
+# convert to keycodes
+#  - returns tuple of keycodes and list of unknown keys
+def convertLineToKeycodes(line, keycodeClass):
+    keycodes = []
+    unknownKeys = []
+    # loop on each key - the filter removes empty values
+    for key in filter(None, line.split(" ")):
+        key = key.upper()
+        # find the keycode for the command in the list
+        command_keycode = duckyCommands.get(key, None)
+        if command_keycode is not None:
+            # if it exists in the list, use it
+            keycodes.append(command_keycode)
+        elif hasattr(keycodeClass, key):
+            # if it's in the Keycode module, use it (allows any valid keycode)
+            keycodes.append(getattr(keycodeClass, key))
+        else:
+            unknownKeys.append(key)
+    return tuple(keycodes), unknownKeys
+
+
+# build OR-ed mask of mouse buttons to click/press/release
+#  - returns mask and list of unknown buttons
+def convertLineToMouseButtons(line):
+    buttons = 0
+    unknownButtons = []
+    for button in filter(None, line.split(" ")):
+        mask = mouseButtons.get(button, None)
+        if mask is None:
+            unknownButtons.append(button)
+        else:
+            buttons |= mask
+    return buttons, unknownButtons
+
+
+# compile a mouse command (tokens without the leading MOUSE)
+def compileMouseLine(tokens, lineNumber, line, unknown):
+    if tokens[0] == "MOVE":
+        return (OP_MOUSE_MOVE, lineNumber, line, int(tokens[1]), int(tokens[2]))
+
+    if tokens[0] == "WHEEL":
+        return (OP_MOUSE_WHEEL, lineNumber, line, int(joinTokens(tokens, 1)))
+
+    if tokens[0] == "RELEASEALL":
+        return (OP_MOUSE_RELEASEALL, lineNumber, line)
+
+    opcode = {
+        "CLICK": OP_MOUSE_CLICK,
+        "PRESS": OP_MOUSE_PRESS,
+        "RELEASE": OP_MOUSE_RELEASE,
+    }.get(tokens[0], None)
+    if opcode is None:
+        unknown.append(f"MOUSE {tokens[0]}")
+        return (OP_NOOP, lineNumber, line)
+
+    buttons, unknownButtons = convertLineToMouseButtons(joinTokens(tokens, 1))
+    for button in unknownButtons:
+        unknown.append(f"mouse button {button}")
+    return (opcode, lineNumber, line, buttons)
+
+
+# compile a consumer control command (tokens without the leading CC)
+def compileConsumerControlLine(tokens, lineNumber, line, unknown):
+    if tokens[0] == "RELEASE":
+        return (OP_CC_RELEASE, lineNumber, line)
+
+    opcode = {"SEND": OP_CC_SEND, "PRESS": OP_CC_PRESS}.get(tokens[0], None)
+    if opcode is None:
+        unknown.append(f"CC {tokens[0]}")
+        return (OP_NOOP, lineNumber, line)
+
+    consumer_code = consumerControlCommands.get(joinTokens(tokens, 1), None)
+    if consumer_code is None:
+        unknown.append(f"consumer control code {joinTokens(tokens, 1)}")
+        return (OP_NOOP, lineNumber, line)
+    return (opcode, lineNumber, line, consumer_code)
+
+
+# compile a single line of duckyscript into an instruction
+#  - names that could not be resolved are appended to the provided list
+def compileLine(line, lineNumber, keycodeClass, characterTable, unknown):
+    # split line into tokens (0 = command, 1-x = parameters)
+    tokens = splitToTokens(line)
+
+    # comments and empty lines => nothing to do
+    if tokens[0] == "REM" or line == "":
+        return (OP_NOOP, lineNumber, line)
+
+    if tokens[0] == "DELAY":
+        return (OP_DELAY, lineNumber, line, int(float(tokens[1]) * 1000000))
+
+    if tokens[0] == "STRING" or tokens[0] == "STRINGLN":
+        string = joinTokens(tokens, 1)
+        unknownCharacters = []
+        strokes = convertStringToStrokes(string, characterTable, unknownCharacters)
+        for char in unknownCharacters:
+            unknown.append(f"character {repr(char)}")
+        # press ENTER afterwards
+        if tokens[0] == "STRINGLN":
+            strokes += bytes((0, duckyCommands["ENTER"]))
+        return (OP_STRING, lineNumber, line, string, strokes)
+
+    if tokens[0] == "PRINT":
+        return (OP_PRINT, lineNumber, line, joinTokens(tokens, 1))
+
+    if tokens[0] == "DEFAULTDELAY" or tokens[0] == "DEFAULT_DELAY":
+        return (OP_DEFAULTDELAY, lineNumber, line, int(tokens[1]) * 10)
+
+    if tokens[0] == "TYPINGINTERVAL" or tokens[0] == "TYPING_INTERVAL":
+        return (OP_TYPINGINTERVAL, lineNumber, line, int(tokens[1]) * 1000)
+
+    if tokens[0] == "CALIBRATE":
+        return (OP_CALIBRATE, lineNumber, line, joinTokens(tokens, 1) or None)
+
+    if tokens[0] == "HOSTPROFILE" or tokens[0] == "HOST_PROFILE":
+        return (OP_HOSTPROFILE, lineNumber, line, joinTokens(tokens, 1))
+
+    if tokens[0] == "LED":
+        # toggle if there are not parameters
+        if len(tokens) == 1:
+            return (OP_LED, lineNumber, line, None)
+        return (OP_LED, lineNumber, line, tokens[1].upper() == "ON")
+
+    if tokens[0] == "BLINK_LED":
+        duration = 0.2 if len(tokens) < 2 else float(tokens[1]) / 1000
+        repeats = 1 if len(tokens) < 3 else int(tokens[2])
+        return (OP_BLINKLED, lineNumber, line, duration, repeats)
+
+    if tokens[0] == "IMPORT":
+        return (OP_IMPORT, lineNumber, line, tokens[1])
+
+    if tokens[0] == "LOCALE":
+        return (OP_LOCALE, lineNumber, line, tokens[1])
+
+    if tokens[0] == "MOUSE":
+        return compileMouseLine(tokens[1:], lineNumber, line, unknown)
+
+    if tokens[0] == "CC":
+        return compileConsumerControlLine(tokens[1:], lineNumber, line, unknown)
+
+    if tokens[0] == "PSYCHOMOUSE":
+        if len(tokens) == 1:
+            return (OP_PSYCHOMOUSE, lineNumber, line, True, None, None)
+        if tokens[1] == "OFF":
+            return (OP_PSYCHOMOUSE, lineNumber, line, False, None, None)
+        return (
+            OP_PSYCHOMOUSE,
+            lineNumber,
+            line,
+            True,
+            int(tokens[1]),
+            int(tokens[2]) if len(tokens) > 2 else None,
+        )
+
+    if tokens[0] == "WAITFORWIFI":
+        return (OP_WAITFORWIFI, lineNumber, line, joinTokens(tokens, 1))
+
+    if tokens[0] == "WAITFORLED":
+        ledName = tokens[1].upper()
+        return (
+            OP_WAITFORLED,
+            lineNumber,
+            line,
+            keyboardLeds[ledName],
+            tokens[2].upper() == "ON",
+            ledName,
+        )
+
+    # no recognized special command => convert to keycodes
+    keycodes, unknownKeys = convertLineToKeycodes(line, keycodeClass)
+    for key in unknownKeys:
+        unknown.append(f"key {key}")
+    return (OP_KEYS, lineNumber, line, keycodes, buildKeyboardReport(keycodes))
+
+
+# compile duckyscript lines into a list of instructions
+#  - keycodes and keystrokes are resolved using the provided locale (and LOCALE commands along the way)
+#  - lineLocales: line number => locale in effect after that line (LOCALE commands of IMPORTed payloads)
+#  - lines that cannot be compiled are logged (unless quiet) and turned into no-ops
+#  - returns list of instructions and list of (line number, unresolved name) tuples
+def compileDuckyScript(lines, locale, lineLocales=None, quiet=False):
+    layoutClass, keycodeClass, characterTable = loadLayout(locale)
+    program = []
+    unresolved = []
+    previousIndex = -1
+
+    for lineNumber, line in enumerate(lines, 1):
+        line = line.rstrip()
+        isRepeat = splitToTokens(line)[0] == "REPEAT"
+        unknown = []
+
+        try:
+            if isRepeat:
+                # repeat the last command
+                instruction = (
+                    OP_REPEAT,
+                    lineNumber,
+                    line,
+                    int(line.split(" ")[1]),
+                    previousIndex,
+                )
+            else:
+                instruction = compileLine(
+                    line, lineNumber, keycodeClass, characterTable, unknown
+                )
+                previousIndex = len(program)
+
+            # switch keycodes and keystrokes for all following lines
+            if instruction[0] == OP_LOCALE:
+                layoutClass, keycodeClass, characterTable = loadLayout(instruction[3])
+            elif lineLocales is not None and lineNumber in lineLocales:
+                layoutClass, keycodeClass, characterTable = loadLayout(lineLocales[lineNumber])
+
+        except (ImportError, IndexError, KeyError, ValueError):
+            if not quiet:
+                warning("Invalid line {}: <{}>", lineNumber, line)
+            unknown = []
+            unresolved.append((lineNumber, line))
+            instruction = (OP_NOOP, lineNumber, line)
+            if not isRepeat:
+                previousIndex = len(program)
+
+        for name in unknown:
+            if not quiet:
+                warning("Unknown {} in line {}", name, lineNumber)
+            unresolved.append((lineNumber, name))
+
+        program.append(instruction)
+
+    return program, unresolved
+
+
+# compile a program again, continuing with another locale after some of its lines
+#  - a LOCALE in an IMPORTed payload applies to the following lines of the importing one as well,
+#    which is only known once the import ran
+#  - every line is kept in its instruction, so programs loaded from sidecars or caches can be recompiled too
+def recompileProgram(program, locale, lineLocales):
+    return compileDuckyScript([instruction[2] for instruction in program], locale, lineLocales)[0]
@@ -61,21 +61,72 @@ config = {
         # reset pin
         "resetPin": board.IO18,
     },
-    # initial sleep to allow device to be recognized by the host computer (in milliseconds)
+    # maximum time to wait for the host computer to pick up the keyboard after USB connection (in milliseconds)
+    # injection starts as soon as the host sends its first keyboard LED report, this is only waited for in full
+    # on hosts that don't send one (or if usbConnection.detectHost is disabled)
     "initialSleep": 500,
     # default keyboard locale to use (put corresponding .mpy layout in lib folder)
     "locale": "DE",
+    # keyboard layouts kept in memory for switching locales (LOCALE), least recently used are dropped first
+    "layoutCache": {
+        # maximum number of layouts
+        "size": 4,
+        # memory to keep free when loading another layout (in bytes)
+        "minimumFree": 16384,
+    },
     # default delay between processing duckyscript lines (in milliseconds)
     "defaultDelay": 0,
+    # HID settings
+    "hid": {
+        # send key combinations (e.g. CTRL ALT DELETE) as a single report instead of pressing one key after another
+        # (disable for hosts that rely on modifiers being pressed before the actual key)
+        "singleReportCombos": True,
+        # minimum time between two HID reports when typing (in microseconds, 0 = as fast as possible)
+        # can be changed at runtime through TYPINGINTERVAL in your payload(s)
+        "reportInterval": 0,
+        # host profile (stored through CALIBRATE) to apply at boot (None = use reportInterval)
+        "hostProfile": None,
+        # time it takes the host to pick up a report if reports aren't paced (in microseconds, USB polling interval)
+        # only used to estimate payload runtimes
+        "reportTime": 1000,
+    },
+    # calibration of the report interval (CALIBRATE command) through the host's lock key LED echo
+    "calibration": {
+        # lock key to toggle: CAPS_LOCK / NUM_LOCK / SCROLL_LOCK
+        "lockKey": "CAPS_LOCK",
+        # report intervals to test from slowest to fastest (in microseconds)
+        "intervals": [8000, 4000, 2000, 1000, 500, 250, 0],
+        # lock key toggles per round (every one has to be echoed by the host)
+        "toggles": 9,
+        # rounds that have to succeed for an interval to be considered safe
+        "rounds": 3,
+        # how long to wait for the host to echo the LED state (in milliseconds)
+        "timeout": 500,
+        # multiply the fastest safe interval by this factor
+        "safetyFactor": 1.5,
+    },
     # USB connection settings
     "usbConnection": {
-        # time to wait between each re-check (in milliseconds)
+        # time between progress updates on the display (in milliseconds)
         "waitDelay": 500,
-        # how many re-checks to perform before starting webserver (if enabled)
+        # how many progress updates to wait for the USB connection before starting webserver (if enabled)
+        # (timeout = waitDelay x waitCycles)
         "waitCycles": 60,
+        # time between checks of the USB connection and host readiness (in milliseconds)
+        "pollInterval": 10,
+        # start injecting once the host sent its first keyboard LED report (False = always sleep initialSleep)
+        "detectHost": True,
         # auto-restart FeatherS2Ducky when changes are written to its storage (you can Ctrl+C and Ctrl+D in REPL to restart)
         "autoRestartOnTouch": False,
     },
+    # startup phase timing (boot timeline, see /api/statistics)
+    "bootTimeline": {
+        # keep the timelines of the last boots (costs a small flash write per boot)
+        "enabled": True,
+        # position in microcontroller.nvm (needs 442 bytes) used to hand over boot.py's phases and to keep the
+        # timelines if the filesystem is read-only (USB drive mounted on the host)
+        "nvmOffset": 0,
+    },
     # stealth mode settings
     "stealth": {
         # disable CDC module (needed for serial console = debugging)
@@ -83,6 +134,13 @@ config = {
         # disable MIDI module
         "disableMIDI": True,
     },
+    # payloads imported by a running script (IMPORT) are compiled once per run and kept in memory
+    "importCache": {
+        # maximum number of compiled instructions to keep (all imports together)
+        "maximumInstructions": 4096,
+        # memory to keep free (in bytes), imports that don't fit are compiled again whenever they're run
+        "minimumFree": 16384,
+    },
     # which payload gets executed when grounding IO11/IO12/IO13/IO14/IO15/IO16
     "payloads": {
         "IO11": "fd/payloads/payload1.dd",
@@ -92,6 +150,21 @@ config = {
         "IO15": "fd/payloads/payload5.dd",
         "IO16": "fd/payloads/payload6.dd",
     },
+    # script output (serial console and web interface)
+    "logging": {
+        # minimum level of messages to record: debug (every line) / info / warning / error / quiet (nothing at all)
+        "level": "debug",
+        # number of messages to keep (oldest messages are dropped first)
+        "capacity": 256,
+        # also print messages on the serial console
+        "serial": True,
+    },
+    # record runtime per command type of the last script (see /api/profile)
+    "profiling": False,
+    # record the last script's executed instructions (number of instructions kept, 0 = disabled) (see /api/trace)
+    "traceCapacity": 0,
+    # store compiled payloads next to their source (payload.dd => payload.ddc) to speed up injection at boot
+    "compiledPayloadCache": True,
     # mouseJiggler configuration
     "mouseJiggler": {
         # minimum amount of wait time for mouse jiggling (in seconds)
@@ -0,0 +1,26 @@
+# configuration: fd/config.py (own settings) completed with fd/config_default.py
+#  - settings added after config.py was copied are taken from the defaults, older copies keep working
+
+
+# add all settings missing in settings from defaults (nested settings are completed as well)
+def mergeDefaults(settings, defaults):
+    for key, value in defaults.items():
+        if key not in settings:
+            settings[key] = value
+        elif isinstance(value, dict) and isinstance(settings[key], dict):
+            mergeDefaults(settings[key], value)
+
+
+def loadConfig():
+    from fd.config_default import config as defaults
+
+    try:
+        from fd.config import config
+    except ImportError:
+        print(
+            "Using default configuration (config_default.py). To use your own settings copy as config.py and modify to taste."
+        )
+        return defaults
+
+    mergeDefaults(config, defaults)
+    return config
@@ -0,0 +1,222 @@
+from fd.compiler import compileDuckyScript, recompileProgram
+from fd.opcodes import (
+    OP_BLINKLED,
+    OP_CALIBRATE,
+    OP_CC_PRESS,
+    OP_CC_RELEASE,
+    OP_CC_SEND,
+    OP_DEFAULTDELAY,
+    OP_DELAY,
+    OP_HOSTPROFILE,
+    OP_IMPORT,
+    OP_KEYS,
+    OP_LOCALE,
+    OP_MOUSE_CLICK,
+    OP_MOUSE_MOVE,
+    OP_MOUSE_PRESS,
+    OP_MOUSE_RELEASE,
+    OP_MOUSE_RELEASEALL,
+    OP_MOUSE_WHEEL,
+    OP_PSYCHOMOUSE,
+    OP_REPEAT,
+    OP_STRING,
+    OP_TYPINGINTERVAL,
+    OP_WAITFORLED,
+    OP_WAITFORWIFI,
+)
+
+# runtime estimates of compiled payloads (without running them or sending any HID reports)
+#  - walks programs the way the executor runs them: DELAY, DEFAULTDELAY after every line, REPEAT, BLINKLED,
+#    typing (STRING, key combos) and IMPORT (dry runs only)
+#  - typing reports take reportInterval (pacing) but at least reportTime (host polling) to be sent,
+#    mouse and consumer control reports aren't paced
+#  - instructions waiting for external events (WAITFORLED, WAITFORWIFI, CALIBRATE) count as 0
+#    and are listed as untimed
+
+# HID reports sent by mouse and consumer control instructions
+otherReports = {
+    OP_MOUSE_MOVE: 1,
+    OP_MOUSE_WHEEL: 1,
+    OP_MOUSE_CLICK: 2,
+    OP_MOUSE_PRESS: 1,
+    OP_MOUSE_RELEASE: 1,
+    OP_MOUSE_RELEASEALL: 1,
+    OP_CC_SEND: 2,
+    OP_CC_PRESS: 1,
+    OP_CC_RELEASE: 1,
+}
+
+untimedOpcodes = {OP_WAITFORLED, OP_WAITFORWIFI, OP_CALIBRATE}
+
+
+# state of an estimate, shared by a program and its imports (like the executor's globals)
+#  - settings: "locale", "reportInterval" (ns), "defaultDelay" (ms), "reportTime" (ns), "singleReportCombos",
+#    "psychoMouse", "psychoMouseCharacters", "hostProfiles" (all optional)
+#  - followImports: compile and walk imported payloads (otherwise IMPORTs count as 0)
+def estimateState(settings, followImports=False):
+    return {
+        "locale": settings.get("locale", "US"),
+        "reportInterval": settings.get("reportInterval", 0),
+        "defaultDelay": settings.get("defaultDelay", 0),
+        "reportTime": settings.get("reportTime", 1000000),
+        "singleReportCombos": settings.get("singleReportCombos", True),
+        "psychoMouse": settings.get("psychoMouse", False),
+        "psychoMouseCharacters": settings.get("psychoMouseCharacters", 5),
+        "hostProfiles": settings.get("hostProfiles", None) or {},
+        "followImports": followImports,
+        # results (times in ns)
+        "delays": 0,
+        "input": 0,
+        "reports": 0,
+        "instructions": 0,
+        "imports": [],
+        "unresolved": [],
+        "untimed": [],
+        # payloads being walked (innermost last) and programs compiled so far
+        "stack": [],
+        "programs": {},
+    }
+
+
+# add HID reports to the estimate
+def addReports(state, reports, paced=True):
+    state["reports"] += reports
+    if paced:
+        state["input"] += reports * max(state["reportInterval"], state["reportTime"])
+    else:
+        state["input"] += reports * state["reportTime"]
+
+
+# compile an imported payload (once per payload and locale)
+#  - returns None if the payload can't be read
+def importProgram(path, state, lineNumber):
+    key = (path, state["locale"])
+    if key not in state["programs"]:
+        try:
+            f = open(path, "r", encoding="utf-8")
+            program, unresolved = compileDuckyScript(f, state["locale"])
+            f.close()
+        except (OSError, UnicodeError):
+            state["programs"][key] = None
+            state["unresolved"].append({"payload": state["stack"][-1], "line": lineNumber, "name": f"payload {path}"})
+            return None
+        state["programs"][key] = program
+        state["imports"].append(path)
+        for lineNumber, name in unresolved:
+            state["unresolved"].append({"payload": path, "line": lineNumber, "name": name})
+    return state["programs"][key]
+
+
+# estimate a single instruction
+def estimateInstruction(instruction, state):
+    opcode = instruction[0]
+    state["instructions"] += 1
+    if opcode == OP_DELAY:
+        state["delays"] += instruction[3]
+    elif opcode == OP_STRING:
+        addReports(state, len(instruction[4]))
+        # psychoMouse moves the mouse every X characters
+        if state["psychoMouse"]:
+            chunkSize = 2 * state["psychoMouseCharacters"]
+            addReports(state, (len(instruction[4]) + chunkSize - 1) // chunkSize, paced=False)
+    elif opcode == OP_KEYS:
+        addReports(state, 2 if state["singleReportCombos"] else len(instruction[3]) + 1)
+    elif opcode in otherReports:
+        addReports(state, otherReports[opcode], paced=False)
+    elif opcode == OP_BLINKLED:
+        state["delays"] += int(instruction[3] * 2 * instruction[4] * 1000000000)
+    elif opcode == OP_DEFAULTDELAY:
+        state["defaultDelay"] = instruction[3]
+    elif opcode == OP_TYPINGINTERVAL:
+        state["reportInterval"] = instruction[3]
+    elif opcode == OP_HOSTPROFILE:
+        if instruction[3] in state["hostProfiles"]:
+            state["reportInterval"] = state["hostProfiles"][instruction[3]]["reportInterval"] * 1000
+        else:
+            state["unresolved"].append({"payload": state["stack"][-1], "line": instruction[1], "name": f"host profile {instruction[3]}"})
+    elif opcode == OP_PSYCHOMOUSE:
+        state["psychoMouse"] = instruction[3]
+        if instruction[4] is not None:
+            state["psychoMouseCharacters"] = instruction[4]
+    elif opcode == OP_LOCALE:
+        state["locale"] = instruction[3]
+    elif opcode == OP_IMPORT and state["followImports"]:
+        path = instruction[3]
+        # payloads importing themselves (directly or indirectly) would never finish
+        if path in state["stack"]:
+            state["unresolved"].append({"payload": state["stack"][-1], "line": instruction[1], "name": f"import cycle {path}"})
+            return
+        program = importProgram(path, state, instruction[1])
+        if program is not None:
+            estimateSteps(program, state, path)
+    elif opcode in untimedOpcodes:
+        state["untimed"].append({"payload": state["stack"][-1], "line": instruction[1], "command": instruction[2]})
+
+
+# estimate all instructions of a program (including the default delay after every line)
+#  - the program has to be compiled with the current locale, the rest of it is compiled again if an IMPORT
+#    leaves another locale behind (like the executor does)
+def estimateSteps(program, state, path):
+    state["stack"].append(path)
+    locale = compiledLocale = state["locale"]
+    lineLocales = {}
+    index = 0
+    while index < len(program):
+        instruction = program[index]
+        if instruction[0] == OP_REPEAT:
+            for i in range(instruction[3]):
+                if instruction[4] >= 0:
+                    estimateInstruction(program[instruction[4]], state)
+                state["delays"] += state["defaultDelay"] * 1000000
+        else:
+            estimateInstruction(instruction, state)
+        state["delays"] += state["defaultDelay"] * 1000000
+
+        if instruction[0] == OP_LOCALE:
+            compiledLocale = instruction[3]
+        elif state["locale"] != compiledLocale:
+            compiledLocale = lineLocales[instruction[1]] = state["locale"]
+            program = recompileProgram(program, locale, lineLocales)
+        index += 1
+    state["stack"].pop()
+
+
+# estimated runtime of a compiled program (ns)
+#  - IMPORTs aren't followed
+def estimateProgram(program, reportInterval=0, defaultDelay=0, reportTime=1000000, singleReportCombos=True):
+    state = estimateState(
+        {
+            "reportInterval": reportInterval,
+            "defaultDelay": defaultDelay,
+            "reportTime": reportTime,
+            "singleReportCombos": singleReportCombos,
+        }
+    )
+    estimateSteps(program, state, "")
+    return state["delays"] + state["input"]
+
+
+# dry run of duckyscript lines (payload file content or fileless script)
+#  - follows IMPORTs (compiling imported payloads from flash) and collects everything the compiler couldn't
+#    resolve (unknown keys, characters, invalid lines, missing payloads and host profiles, import cycles)
+#  - settings: see estimateState
+#  - returns a JSON serializable report (times in milliseconds)
+def dryRun(lines, settings, path="<fileless duckyscript>"):
+    state = estimateState(settings, followImports=True)
+    program, unresolved = compileDuckyScript(lines, state["locale"])
+    for lineNumber, name in unresolved:
+        state["unresolved"].append({"payload": path, "line": lineNumber, "name": name})
+    estimateSteps(program, state, path)
+
+    return {
+        "payload": path,
+        "estimate": (state["delays"] + state["input"]) // 1000000,
+        "delays": state["delays"] // 1000000,
+        "input": state["input"] // 1000000,
+        "reports": state["reports"],
+        "instructions": state["instructions"],
+        "imports": state["imports"],
+        "unresolved": state["unresolved"],
+        "untimed": state["untimed"],
+        "unit_of_measurement": "ms",
+    }
@@ -0,0 +1,185 @@
+import time
+
+# raw HID boot keyboard reports: [modifier bitmask, reserved, key 1, ..., key 6]
+EMPTY_KEYBOARD_REPORT = bytes(8)
+
+
+# build a keyboard report pressing all provided keycodes at once
+#  - modifiers (LEFT_CONTROL..RIGHT_GUI) are OR-ed into the modifier byte
+#  - only the first 6 regular keys fit into a report
+def buildKeyboardReport(keycodes):
+    report = bytearray(8)
+    slot = 2
+    for keycode in keycodes:
+        if 0xE0 <= keycode <= 0xE7:
+            report[0] |= 1 << (keycode - 0xE0)
+        elif slot < 8 and keycode not in report[2:slot]:
+            report[slot] = keycode
+            slot += 1
+    return bytes(report)
+
+
+# modifier bits used by keyboard layouts
+SHIFT_MODIFIER = 0x02
+ALTGR_MODIFIER = 0x40
+
+# preallocated report for typing keystrokes
+strokeReport = bytearray(8)
+
+
+# convert a layout keycode (with SHIFT_FLAG) into a (modifier, keycode) keystroke
+def layoutKeycodeToStroke(keycode, altgr=False):
+    modifier = ALTGR_MODIFIER if altgr else 0
+    if keycode & 0x80:
+        modifier |= SHIFT_MODIFIER
+    return bytes((modifier, keycode & 0x7F))
+
+
+# build a flat table of keystrokes for every character a keyboard layout can type
+#  - ASCII characters map to one (modifier, keycode) pair in a 256 bytes table (keycode 0 = not typeable)
+#  - higher characters and dead-key sequences (e.g. ^ + e => ê) map to a bytes object of pairs in a dict
+#  - returns (ascii table, dict of other characters)
+def buildCharacterTable(layoutClass):
+    asciiToKeycode = layoutClass.ASCII_TO_KEYCODE
+    higherAscii = getattr(layoutClass, "HIGHER_ASCII", {})
+    needAltGr = getattr(layoutClass, "NEED_ALTGR", "")
+    combinedKeys = getattr(layoutClass, "COMBINED_KEYS", {})
+
+    def charToKeycode(code):
+        if code < len(asciiToKeycode):
+            return asciiToKeycode[code]
+        return higherAscii.get(code, 0) or higherAscii.get(chr(code), 0)
+
+    asciiStrokes = bytearray(256)
+    otherStrokes = {}
+
+    codes = list(range(min(128, len(asciiToKeycode))))
+    for code in higherAscii:
+        codes.append(code if isinstance(code, int) else ord(code))
+    codes.extend(combinedKeys)
+
+    for code in codes:
+        keycode = charToKeycode(code)
+        if keycode:
+            stroke = layoutKeycodeToStroke(keycode, chr(code) in needAltGr)
+        elif code in combinedKeys:
+            # dead key followed by a regular key
+            combined = combinedKeys[code]
+            secondKeycode = charToKeycode(combined & 0x7F)
+            if not secondKeycode:
+                continue
+            stroke = layoutKeycodeToStroke(combined >> 8, combined & 0x80) + layoutKeycodeToStroke(secondKeycode)
+        else:
+            continue
+
+        if code < 128 and len(stroke) == 2:
+            asciiStrokes[2 * code] = stroke[0]
+            asciiStrokes[2 * code + 1] = stroke[1]
+        else:
+            otherStrokes[code] = stroke
+
+    return asciiStrokes, otherStrokes
+
+
+# convert a string into a stream of (modifier, keycode) keystrokes
+#  - characters the layout can't type are appended to the provided list and skipped
+def convertStringToStrokes(s, characterTable, unknown):
+    asciiStrokes, otherStrokes = characterTable
+    strokes = bytearray()
+    for char in s:
+        code = ord(char)
+        if code < 128 and asciiStrokes[2 * code + 1]:
+            strokes.append(asciiStrokes[2 * code])
+            strokes.append(asciiStrokes[2 * code + 1])
+        elif code in otherStrokes:
+            strokes.extend(otherStrokes[code])
+        else:
+            unknown.append(char)
+    return bytes(strokes)
+
+
+# busy-wait until the provided deadline (time.monotonic_ns)
+#  - returns the current time
+def waitUntil(deadline):
+    now = time.monotonic_ns()
+    while now < deadline:
+        now = time.monotonic_ns()
+    return now
+
+
+# time (time.monotonic_ns) the last paced report was sent
+lastReportTime = 0
+
+
+# send a report at least reportInterval nanoseconds after the previous paced report
+def sendPaced(device, report, reportInterval=0):
+    global lastReportTime
+    lastReportTime = waitUntil(lastReportTime + reportInterval)
+    device.send_report(report)
+
+
+# send a report and its release
+#  - waits at least reportInterval nanoseconds between reports (0 = as fast as possible)
+def pressAndRelease(device, report, reportInterval=0):
+    sendPaced(device, report, reportInterval)
+    sendPaced(device, EMPTY_KEYBOARD_REPORT, reportInterval)
+
+
+# type keystrokes by sending a press and a release report for each (modifier, keycode) pair
+#  - reports are paced reportInterval nanoseconds apart (0 = as fast as possible)
+#  - deadlines are absolute and based on the previous send, so a late report never causes a burst
+def sendStrokes(device, strokes, start=0, end=None, reportInterval=0):
+    global lastReportTime
+    if end is None:
+        end = len(strokes)
+    report = strokeReport
+
+    if not reportInterval:
+        for i in range(start, end, 2):
+            report[0] = strokes[i]
+            report[2] = strokes[i + 1]
+            device.send_report(report)
+            device.send_report(EMPTY_KEYBOARD_REPORT)
+        lastReportTime = time.monotonic_ns()
+        return
+
+    last = lastReportTime
+    for i in range(start, end, 2):
+        report[0] = strokes[i]
+        report[2] = strokes[i + 1]
+        last = waitUntil(last + reportInterval)
+        device.send_report(report)
+        last = waitUntil(last + reportInterval)
+        device.send_report(EMPTY_KEYBOARD_REPORT)
+    lastReportTime = last
+
+
+# number of reports sent through counting devices
+sentReports = 0
+
+
+def reportCount():
+    return sentReports
+
+
+# HID device wrapper counting the reports sent through it (used for execution traces)
+#  - onReport: called once a report was sent (e.g. to mark the first one in the boot timeline)
+class CountingDevice:
+    def __init__(self, device, onReport=None):
+        self.device = device
+        self.onReport = onReport
+
+    def send_report(self, report, report_id=None):
+        global sentReports
+        sentReports += 1
+        if report_id is None:
+            self.device.send_report(report)
+        else:
+            self.device.send_report(report, report_id)
+        if self.onReport is not None:
+            self.onReport()
+
+    def get_last_received_report(self, report_id=None):
+        if report_id is None:
+            return self.device.get_last_received_report()
+        return self.device.get_last_received_report(report_id)
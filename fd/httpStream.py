@@ -0,0 +1,216 @@
+import errno
+import os
+
+# long-lived HTTP responses (e.g. Server-Sent Events) and streamed request bodies on top of ampule
+#  - ampule sends the handler's response and closes the client once the handler returns
+#  - wrapping the listening socket lets a handler detach the client of the current request: it's kept open
+#    and whatever ampule sends to it afterwards is discarded
+#  - for streaming paths ampule only gets to read the request head, the handler reads the body in chunks
+
+
+# client connection as seen by ampule
+class ClientConnection:
+    def __init__(self, client, streamingPaths):
+        self.client = client
+        self.detached = False
+        self.streamingPaths = streamingPaths
+        # request head received so far (None once it's clear that the whole request goes to ampule)
+        self.head = bytearray()
+        self.streaming = None
+        # body bytes received along with the request head (streaming requests)
+        self.pending = b""
+
+    def setblocking(self, flag):
+        self.client.setblocking(flag)
+
+    def settimeout(self, value):
+        self.client.settimeout(value)
+
+    # receive request data for ampule
+    #  - streaming requests end with their head (the body is left to the handler)
+    def recv_into(self, buffer, nbytes=0):
+        if self.head is None:
+            return self.client.recv_into(buffer, nbytes)
+        if self.streaming and not len(self.head):
+            return 0
+
+        length = self.client.recv_into(buffer, nbytes)
+        self.head.extend(memoryview(buffer)[:length])
+
+        # decide by the request line's path
+        if self.streaming is None:
+            lineEnd = self.head.find(b"\r\n")
+            if lineEnd < 0:
+                return length
+            path = bytes(self.head[:lineEnd]).split(b" ")[1].split(b"?")[0].decode()
+            self.streaming = path in self.streamingPaths
+            if not self.streaming:
+                self.head = None
+                return length
+
+        headEnd = self.head.find(b"\r\n\r\n")
+        if headEnd < 0:
+            return length
+
+        # keep body bytes for the handler
+        headEnd += 4
+        self.pending = bytes(self.head[headEnd:])
+        self.head = bytearray()
+        return length - len(self.pending)
+
+    # read the body of a streaming request chunk by chunk
+    #  - length: Content-Length of the request
+    #  - yields memoryviews (only valid until the next chunk is read)
+    #  - raises OSError if the client doesn't deliver the whole body in time
+    def readBody(self, length, buffer, timeout=10):
+        pending = memoryview(self.pending)[:length]
+        self.pending = b""
+        if len(pending):
+            yield pending
+        remaining = length - len(pending)
+
+        view = memoryview(buffer)
+        self.client.settimeout(timeout)
+        while remaining > 0:
+            received = self.client.recv_into(buffer, min(remaining, len(buffer)))
+            if not received:
+                raise OSError(errno.ECONNRESET)
+            remaining -= received
+            yield view[:received]
+
+    def send(self, data):
+        if self.detached:
+            return len(data)
+        return self.client.send(data)
+
+    def close(self):
+        if not self.detached:
+            self.client.close()
+
+
+# listening socket handed to ampule.listen
+#  - streamingPaths: request paths whose body is read by the handler (see requestBody)
+class ListeningSocket:
+    def __init__(self, socket, streamingPaths=()):
+        self.socket = socket
+        self.streamingPaths = streamingPaths
+        self.current = None
+
+    def setblocking(self, flag):
+        self.socket.setblocking(flag)
+
+    def settimeout(self, value):
+        self.socket.settimeout(value)
+
+    def accept(self):
+        client, address = self.socket.accept()
+        self.current = ClientConnection(client, self.streamingPaths)
+        return self.current, address
+
+    # body of the streaming request currently being handled (chunks, see ClientConnection.readBody)
+    def requestBody(self, length, buffer=None):
+        return self.current.readBody(length, fileBuffer if buffer is None else buffer)
+
+    # take over the client of the request currently being handled
+    def detachClient(self):
+        self.current.detached = True
+        return self.current.client
+
+
+# send all data, retrying while the (non-blocking) socket is busy
+def sendAll(client, data):
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    data = memoryview(data)
+    while len(data):
+        try:
+            sent = client.send(data)
+        except OSError as e:
+            if e.errno == errno.EAGAIN:
+                continue
+            raise
+        data = data[sent:]
+
+
+# respond with the headers of an event stream (the connection stays open)
+def startEventStream(client):
+    sendAll(
+        client,
+        "HTTP/1.1 200 OK\r\n"
+        "Content-Type: text/event-stream; charset=UTF-8\r\n"
+        "Cache-Control: no-cache\r\n"
+        "Access-Control-Allow-Origin: *\r\n"
+        "\r\n",
+    )
+
+
+# send a single event (multi-line data is split into several data fields)
+def sendEvent(client, data, event=None, eventId=None):
+    message = []
+    if event is not None:
+        message.append(f"event: {event}\n")
+    if eventId is not None:
+        message.append(f"id: {eventId}\n")
+    for line in data.split("\n"):
+        message.append(f"data: {line}\n")
+    message.append("\n")
+    sendAll(client, "".join(message))
+
+
+# reason phrases of the status codes sent directly
+statusReasons = {
+    200: "OK",
+    304: "Not Modified",
+    404: "Not Found",
+}
+
+
+# reusable buffer for file responses
+FILE_BUFFER_SIZE = 1024
+fileBuffer = bytearray(FILE_BUFFER_SIZE)
+
+
+# send status line and headers of a response with a body of the provided length
+def sendHead(client, status, headers, length):
+    head = [f"HTTP/1.1 {status} {statusReasons.get(status, 'OK')}\r\n"]
+    for key, value in headers.items():
+        head.append(f"{key}: {value}\r\n")
+    head.append(f"Content-Length: {length}\r\n")
+    head.append("Connection: close\r\n\r\n")
+    sendAll(client, "".join(head))
+
+
+# send a complete response (bytes body) to a detached client
+def sendResponse(client, status, headers, body=b""):
+    sendHead(client, status, headers, len(body))
+    if body:
+        sendAll(client, body)
+
+
+# send a file as response to a detached client
+#  - the file is passed through a single reusable buffer, so memory usage doesn't depend on its size
+#  - raises OSError (before anything was sent) if the file can't be opened
+def sendFile(client, status, headers, path):
+    f = open(path, "rb")
+    try:
+        sendHead(client, status, headers, os.stat(path)[6])
+        view = memoryview(fileBuffer)
+        while True:
+            length = f.readinto(fileBuffer)
+            if not length:
+                break
+            sendAll(client, view[:length])
+    finally:
+        f.close()
+
+
+# split a request body (chunks of bytes) into lines of text
+def bodyLines(chunks):
+    rest = b""
+    for chunk in chunks:
+        lines = (rest + bytes(chunk)).split(b"\n")
+        rest = lines.pop()
+        for line in lines:
+            yield line.decode("utf-8")
+    if rest:
+        yield rest.decode("utf-8")
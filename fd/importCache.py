@@ -0,0 +1,105 @@
+import gc
+
+from fd.opcodes import OP_IMPORT, OP_LOCALE
+
+# compiled payloads imported by the running script (IMPORT)
+#  - every imported payload is compiled once per run (and locale) and kept until the run is over
+#  - the import graph is resolved before the script runs: an import cycle would recurse forever
+#    (duckyscript has no conditions, every IMPORT is executed)
+#  - bounded by the total number of cached instructions and the memory that has to stay free,
+#    imports that don't fit are compiled again whenever they're run
+
+programs = {}
+cachedInstructions = 0
+settings = {
+    "maximumInstructions": 4096,
+    "minimumFree": 16384,
+}
+
+# free memory is only known on the device
+memFree = getattr(gc, "mem_free", None)
+
+
+# payloads importing each other (cycle: paths, the first one is imported again by the last one)
+class ImportCycleError(Exception):
+    def __init__(self, cycle):
+        super().__init__("Import cycle: {}".format(" -> ".join(cycle)))
+        self.cycle = cycle
+
+
+def configureImportCache(maximumInstructions, minimumFree):
+    settings["maximumInstructions"] = maximumInstructions
+    settings["minimumFree"] = minimumFree
+
+
+def clearImportCache():
+    global cachedInstructions
+    programs.clear()
+    cachedInstructions = 0
+
+
+# compiled program of an imported payload (None if it isn't cached)
+def cachedImport(path, locale):
+    return programs.get((path, locale), None)
+
+
+# keep the compiled program of an imported payload
+#  - returns False if it doesn't fit
+def cacheImport(path, locale, program):
+    global cachedInstructions
+    if (path, locale) in programs:
+        return True
+    if cachedInstructions + len(program) > settings["maximumInstructions"]:
+        return False
+    if memFree is not None and memFree() < settings["minimumFree"]:
+        return False
+    programs[(path, locale)] = program
+    cachedInstructions += len(program)
+    return True
+
+
+# compile (and cache) all payloads imported by a program, following their imports as well
+#  - loadProgram(path, locale): compiled program of a payload (raises OSError / UnicodeError if it can't be read,
+#    missing imports are reported once they're run)
+#  - locale: locale the program starts with (LOCALE instructions change it for all following imports, just like
+#    they do when running)
+#  - raises ImportCycleError if payloads import each other
+def resolveImports(program, path, locale, loadProgram):
+    cycle = resolveGraph(program, [locale], loadProgram, [path], {})
+    if cycle is not None:
+        raise ImportCycleError(cycle)
+
+
+# depth first walk of the import graph
+#  - state: [current locale]
+#  - stack: paths of the payloads being walked
+#  - resolved: (path, locale) => locale afterwards, for payloads walked completely (imported again without a walk)
+def resolveGraph(program, state, loadProgram, stack, resolved):
+    for instruction in program:
+        if instruction[0] == OP_LOCALE:
+            state[0] = instruction[3]
+        elif instruction[0] == OP_IMPORT:
+            path = instruction[3]
+            if path in stack:
+                return stack[stack.index(path) :] + [path]
+
+            key = (path, state[0])
+            if key in resolved:
+                state[0] = resolved[key]
+                continue
+
+            imported = cachedImport(path, state[0])
+            if imported is None:
+                try:
+                    imported = loadProgram(path, state[0])
+                except (OSError, UnicodeError):
+                    continue
+                cacheImport(path, state[0], imported)
+
+            stack.append(path)
+            cycle = resolveGraph(imported, state, loadProgram, stack, resolved)
+            stack.pop()
+            if cycle is not None:
+                return cycle
+            resolved[key] = state[0]
+    return None
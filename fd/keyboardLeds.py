@@ -0,0 +1,17 @@
+from adafruit_hid.keyboard import Keyboard
+from adafruit_hid.keycode import Keycode
+
+# map keyboard LED names to LED codes
+keyboardLeds = {
+    "CAPS_LOCK": Keyboard.LED_CAPS_LOCK,
+    "COMPOSE": Keyboard.LED_COMPOSE,
+    "NUM_LOCK": Keyboard.LED_NUM_LOCK,
+    "SCROLL_LOCK": Keyboard.LED_SCROLL_LOCK,
+}
+
+# map keyboard LED names to the lock keys toggling them
+keyboardLedKeys = {
+    "CAPS_LOCK": Keycode.CAPS_LOCK,
+    "NUM_LOCK": Keycode.KEYPAD_NUMLOCK,
+    "SCROLL_LOCK": Keycode.SCROLL_LOCK,
+}
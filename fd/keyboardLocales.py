@@ -0,0 +1,92 @@
+import gc
+import sys
+
+from fd.hidReports import buildCharacterTable
+
+# keyboard layouts loaded so far, with their precomputed keystroke tables
+#  - locale: [KeyboardLayout class, Keycode class, keystroke table, last use]
+#  - switching between loaded locales is a single lookup
+#  - bounded by a maximum number of layouts and the memory that has to stay free,
+#    the least recently used layouts are dropped first (along with their modules)
+
+layouts = {}
+useCounter = 0
+settings = {
+    "size": 4,
+    "minimumFree": 16384,
+}
+
+# free memory is only known on the device (not when compiling payloads on the host)
+memFree = getattr(gc, "mem_free", None)
+
+
+def configureLayouts(size, minimumFree):
+    settings["size"] = max(1, size)
+    settings["minimumFree"] = minimumFree
+
+
+# dynamically import keyboard layout and keycode classes of the provided locale
+#  - US is shipped with adafruit_hid
+#  - any other locale requires keyboard_layout_win_xx and keycode_win_xx in the lib folder
+#  - returns the KeyboardLayout and Keycode classes
+def importLocale(locale):
+    if locale.upper() == "US":
+        moduleKeyboardLayout = __import__(
+            "adafruit_hid.keyboard_layout_us", globals(), locals(), ["KeyboardLayoutUS"]
+        )
+        moduleKeycode = __import__(
+            "adafruit_hid.keycode", globals(), locals(), ["Keycode"]
+        )
+        return moduleKeyboardLayout.KeyboardLayoutUS, moduleKeycode.Keycode
+
+    moduleKeyboardLayout = __import__(
+        "keyboard_layout_win_" + locale.lower(),
+        globals(),
+        locals(),
+        ["KeyboardLayout"],
+    )
+    moduleKeycode = __import__(
+        "keycode_win_" + locale.lower(), globals(), locals(), ["Keycode"]
+    )
+    return moduleKeyboardLayout.KeyboardLayout, moduleKeycode.Keycode
+
+
+# drop the least recently used layout (except the provided locale)
+#  - its modules are unloaded as well (US is part of adafruit_hid and stays)
+#  - returns False if there was nothing to drop
+def evictLayout(keep):
+    oldest = None
+    for locale, entry in layouts.items():
+        if locale != keep and (oldest is None or entry[3] < layouts[oldest][3]):
+            oldest = locale
+    if oldest is None:
+        return False
+
+    del layouts[oldest]
+    if oldest != "US":
+        sys.modules.pop("keyboard_layout_win_" + oldest.lower(), None)
+        sys.modules.pop("keycode_win_" + oldest.lower(), None)
+    return True
+
+
+# keyboard layout of the provided locale (imported and precomputed on first use)
+#  - returns the KeyboardLayout class, Keycode class and keystroke table
+def loadLayout(locale):
+    global useCounter
+    locale = locale.upper()
+    useCounter += 1
+
+    entry = layouts.get(locale, None)
+    if entry is None:
+        while len(layouts) >= settings["size"] and evictLayout(locale):
+            pass
+        if memFree is not None:
+            while memFree() < settings["minimumFree"] and evictLayout(locale):
+                gc.collect()
+
+        layoutClass, keycodeClass = importLocale(locale)
+        entry = [layoutClass, keycodeClass, buildCharacterTable(layoutClass), 0]
+        layouts[locale] = entry
+
+    entry[3] = useCounter
+    return entry[0], entry[1], entry[2]
@@ -0,0 +1,102 @@
+# bounded in-memory log of script output
+#  - records are kept in a fixed-size ring buffer (oldest records are dropped first)
+#  - records store their format string and arguments, formatting happens when they are read
+#  - messages below the configured level are discarded without being formatted
+#  - records are numbered (starting with 1 after clearing) so readers can pick up where they left off
+
+# log levels
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+QUIET = 100
+
+levels = {
+    "debug": DEBUG,
+    "info": INFO,
+    "warning": WARNING,
+    "error": ERROR,
+    "quiet": QUIET,
+}
+
+level = DEBUG
+printToSerial = True
+records = [None] * 256
+head = 0
+count = 0
+sequence = 0
+
+
+# set up log level, ring buffer capacity and serial output
+def configureLogger(logLevel="debug", capacity=256, serial=True):
+    global level, printToSerial, records
+    level = levels[logLevel.lower()]
+    printToSerial = serial
+    records = [None] * capacity
+    clearLog()
+
+
+# is a message of the provided level going to be recorded?
+def isEnabled(messageLevel):
+    return messageLevel >= level
+
+
+# record a message
+#  - message is a format string, arguments are only applied when the record is read or printed
+def log(messageLevel, message, *args):
+    global head, count, sequence
+    if messageLevel < level:
+        return
+
+    records[head] = (messageLevel, message, args)
+    head = (head + 1) % len(records)
+    if count < len(records):
+        count += 1
+    sequence += 1
+
+    if printToSerial:
+        print(formatRecord(records[head - 1]))
+
+
+def debug(message, *args):
+    log(DEBUG, message, *args)
+
+
+def info(message, *args):
+    log(INFO, message, *args)
+
+
+def warning(message, *args):
+    log(WARNING, message, *args)
+
+
+def error(message, *args):
+    log(ERROR, message, *args)
+
+
+# drop all records
+def clearLog():
+    global head, count, sequence
+    for i in range(len(records)):
+        records[i] = None
+    head = count = sequence = 0
+
+
+# number of the latest record
+def logSequence():
+    return sequence
+
+
+def formatRecord(record):
+    if record[2]:
+        return record[1].format(*record[2])
+    return record[1]
+
+
+# iterate over all records newer than the provided record number (oldest first)
+#  - yields (record number, record)
+def recordsSince(since):
+    first = max(since, sequence - count)
+    start = (head - (sequence - first)) % len(records)
+    for i in range(sequence - first):
+        yield first + i + 1, records[(start + i) % len(records)]
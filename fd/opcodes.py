@@ -0,0 +1,28 @@
+# opcodes of compiled duckyscript instructions
+#  - every instruction is a tuple: (opcode, line number, source line, arguments...)
+OP_NOOP = 0  # REM / empty line
+OP_DELAY = 1  # nanoseconds
+OP_STRING = 2  # string, keystrokes ((modifier, keycode) pairs)
+OP_PRINT = 3  # text
+OP_DEFAULTDELAY = 4  # default delay
+OP_LED = 5  # state (None = toggle)
+OP_BLINKLED = 6  # duration in seconds, repeats
+OP_IMPORT = 7  # path
+OP_LOCALE = 8  # locale
+OP_MOUSE_MOVE = 9  # x, y
+OP_MOUSE_WHEEL = 10  # amount
+OP_MOUSE_CLICK = 11  # buttons
+OP_MOUSE_PRESS = 12  # buttons
+OP_MOUSE_RELEASE = 13  # buttons
+OP_MOUSE_RELEASEALL = 14
+OP_CC_SEND = 15  # consumer control code
+OP_CC_PRESS = 16  # consumer control code
+OP_CC_RELEASE = 17
+OP_PSYCHOMOUSE = 18  # enabled, characters (or None), range (or None)
+OP_WAITFORWIFI = 19  # ssid
+OP_WAITFORLED = 20  # led code, state, led name
+OP_KEYS = 21  # keycodes, keyboard report
+OP_REPEAT = 22  # count, index of instruction to repeat (-1 = none)
+OP_TYPINGINTERVAL = 23  # interval between reports in nanoseconds
+OP_CALIBRATE = 24  # host profile to store the result in (or None)
+OP_HOSTPROFILE = 25  # host profile to apply
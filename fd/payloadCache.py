@@ -0,0 +1,156 @@
+import os
+import struct
+
+# compiled payloads are stored as a binary sidecar next to their source (payload.dd => payload.ddc)
+#  - header: magic, format version, source size, source mtime, locale used for compiling
+#  - body: number of instructions followed by the tagged values of every instruction
+#  - a sidecar is only valid while size and mtime of the source match
+CACHE_MAGIC = b"DDC"
+CACHE_VERSION = 5
+
+
+# path of the compiled sidecar of a payload
+def cachePath(path):
+    return path + "c"
+
+
+# size and mtime of a file (or None if it doesn't exist)
+def sourceSignature(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat[6], int(stat[8])
+
+
+def encodeValue(buffer, value):
+    if value is None:
+        buffer.extend(b"n")
+    elif value is True:
+        buffer.extend(b"t")
+    elif value is False:
+        buffer.extend(b"f")
+    elif isinstance(value, int):
+        # delays are stored in nanoseconds and exceed 32 bit beyond ~2.1 seconds
+        if -0x80000000 <= value <= 0x7FFFFFFF:
+            buffer.extend(b"i")
+            buffer.extend(struct.pack("<i", value))
+        else:
+            buffer.extend(b"q")
+            buffer.extend(struct.pack("<q", value))
+    elif isinstance(value, float):
+        buffer.extend(b"d")
+        buffer.extend(struct.pack("<f", value))
+    elif isinstance(value, str):
+        data = value.encode("utf-8")
+        buffer.extend(b"s")
+        buffer.extend(struct.pack("<I", len(data)))
+        buffer.extend(data)
+    elif isinstance(value, (bytes, bytearray)):
+        buffer.extend(b"b")
+        buffer.extend(struct.pack("<I", len(value)))
+        buffer.extend(value)
+    elif isinstance(value, tuple):
+        buffer.extend(b"T")
+        buffer.extend(struct.pack("<H", len(value)))
+        for item in value:
+            encodeValue(buffer, item)
+    else:
+        raise ValueError(f"cannot cache value {value}")
+
+
+# decode a value at the given offset
+#  - returns decoded value and offset of the next value
+def decodeValue(data, offset):
+    tag = data[offset]
+    offset += 1
+    if tag == 0x6E:  # n
+        return None, offset
+    if tag == 0x74:  # t
+        return True, offset
+    if tag == 0x66:  # f
+        return False, offset
+    if tag == 0x69:  # i
+        return struct.unpack_from("<i", data, offset)[0], offset + 4
+    if tag == 0x71:  # q
+        return struct.unpack_from("<q", data, offset)[0], offset + 8
+    if tag == 0x64:  # d
+        return struct.unpack_from("<f", data, offset)[0], offset + 4
+    if tag == 0x73 or tag == 0x62:  # s / b
+        length = struct.unpack_from("<I", data, offset)[0]
+        offset += 4
+        value = bytes(data[offset : offset + length])
+        if tag == 0x73:
+            value = value.decode("utf-8")
+        return value, offset + length
+    if tag == 0x54:  # T
+        count = struct.unpack_from("<H", data, offset)[0]
+        offset += 2
+        items = []
+        for i in range(count):
+            item, offset = decodeValue(data, offset)
+            items.append(item)
+        return tuple(items), offset
+    raise ValueError(f"invalid tag {tag}")
+
+
+# write the compiled program of a payload to its sidecar (filesystem has to be writable)
+#  - returns True on success
+def saveCompiled(path, locale, program):
+    signature = sourceSignature(path)
+    if signature is None:
+        return False
+
+    localeData = locale.encode("utf-8")
+    buffer = bytearray(CACHE_MAGIC)
+    buffer.extend(struct.pack("<BIIB", CACHE_VERSION, signature[0], signature[1], len(localeData)))
+    buffer.extend(localeData)
+    buffer.extend(struct.pack("<I", len(program)))
+    try:
+        for instruction in program:
+            encodeValue(buffer, instruction)
+
+        f = open(cachePath(path), "wb")
+        f.write(buffer)
+        f.close()
+        return True
+    except Exception:
+        print("Error trying to write compiled payload: ", cachePath(path))
+        return False
+
+
+# load the compiled program of a payload from its sidecar
+#  - returns None if there is no sidecar or it is outdated
+def loadCompiled(path, locale):
+    signature = sourceSignature(path)
+    if signature is None:
+        return None
+
+    try:
+        f = open(cachePath(path), "rb")
+        data = f.read()
+        f.close()
+    except OSError:
+        return None
+
+    try:
+        if data[0:3] != CACHE_MAGIC:
+            return None
+        version, size, mtime, localeLength = struct.unpack_from("<BIIB", data, 3)
+        if version != CACHE_VERSION or (size, mtime) != signature:
+            return None
+        offset = 3 + struct.calcsize("<BIIB")
+        if data[offset : offset + localeLength].decode("utf-8") != locale:
+            return None
+        offset += localeLength
+
+        count = struct.unpack_from("<I", data, offset)[0]
+        offset += 4
+        program = []
+        for i in range(count):
+            instruction, offset = decodeValue(data, offset)
+            program.append(instruction)
+        return program
+    except Exception:
+        print("Ignoring corrupt compiled payload: ", cachePath(path))
+        return None
@@ -0,0 +1,158 @@
+import json
+import os
+
+from fd.compiler import compileDuckyScript, splitToTokens
+from fd.estimator import estimateProgram
+from fd.payloadStorage import writePayload
+
+# index of all payloads with their metadata
+#  - name: {"size", "mtime", "settings", "lines", "estimate" (ms), "imports"}
+#  - kept in RAM and stored on flash (whenever it's writable), entries are only rebuilt for payloads
+#    whose size or modification time changed, or whose estimate was made with other settings
+#    (locale, report interval and default delay, e.g. of another host profile)
+
+PAYLOADS_PATH = "fd/payloads"
+INDEX_PATH = "fd/payloadIndex.json"
+
+index = None
+# locale and runtime estimate settings (see configureIndex)
+settings = {
+    "locale": "US",
+    "reportInterval": 0,
+    "defaultDelay": 0,
+    "reportTime": 1000000,
+    "singleReportCombos": True,
+}
+
+
+# set the locale and runtime estimate settings
+#  - returns True if any of them changed (entries made with the old ones are rebuilt on the next refresh)
+def configureIndex(locale, reportInterval, defaultDelay, reportTime, singleReportCombos):
+    previous = estimateSettings()
+    settings["locale"] = locale
+    settings["reportInterval"] = reportInterval
+    settings["defaultDelay"] = defaultDelay
+    settings["reportTime"] = reportTime
+    settings["singleReportCombos"] = singleReportCombos
+    return estimateSettings() != previous
+
+
+# settings an estimate was made with (entries made with other settings are rebuilt)
+def estimateSettings():
+    return [
+        settings["locale"],
+        settings["reportInterval"],
+        settings["defaultDelay"],
+        settings["reportTime"],
+        settings["singleReportCombos"],
+    ]
+
+
+# metadata of a single payload
+def describePayload(name):
+    path = f"{PAYLOADS_PATH}/{name}"
+    stat = os.stat(path)
+
+    lines = 0
+    imports = []
+    f = open(path, "r", encoding="utf-8")
+    for line in f:
+        lines += 1
+        tokens = splitToTokens(line.strip())
+        if tokens[0] == "IMPORT" and len(tokens) > 1:
+            imports.append(tokens[1])
+    f.seek(0)
+    program = compileDuckyScript(f, settings["locale"], quiet=True)[0]
+    f.close()
+
+    estimate = estimateProgram(
+        program,
+        settings["reportInterval"],
+        settings["defaultDelay"],
+        settings["reportTime"],
+        settings["singleReportCombos"],
+    )
+    return {
+        "size": stat[6],
+        "mtime": int(stat[8]),
+        "settings": estimateSettings(),
+        "lines": lines,
+        "estimate": estimate // 1000000,
+        "imports": imports,
+    }
+
+
+def loadIndex():
+    try:
+        f = open(INDEX_PATH, "r")
+        entries = json.load(f)
+        f.close()
+        return entries
+    except (OSError, ValueError):
+        return {}
+
+
+# store the index (filesystem has to be writable)
+def saveIndex():
+    if index is None:
+        return False
+    return writePayload(INDEX_PATH, json.dumps(index))
+
+
+# bring the index up to date with the payloads on flash
+#  - returns True if anything changed
+def refreshIndex():
+    global index
+    if index is None:
+        index = loadIndex()
+
+    changed = False
+    current = estimateSettings()
+    names = set(f for f in os.listdir(PAYLOADS_PATH) if f.endswith(".dd"))
+    for name in names:
+        entry = index.get(name, None)
+        try:
+            stat = os.stat(f"{PAYLOADS_PATH}/{name}")
+            if (
+                entry is None
+                or entry["size"] != stat[6]
+                or entry["mtime"] != int(stat[8])
+                or entry.get("settings", None) != current
+            ):
+                index[name] = describePayload(name)
+                changed = True
+        except (OSError, UnicodeError):
+            print("Error trying to index payload: ", name)
+
+    for name in list(index):
+        if name not in names:
+            del index[name]
+            changed = True
+    return changed
+
+
+def isIndexLoaded():
+    return index is not None
+
+
+# update the entry of a (saved) payload
+#  - an index that wasn't loaded yet picks up the change once it's refreshed
+def updatePayload(name):
+    if index is not None:
+        index[name] = describePayload(name)
+
+
+def removePayload(name):
+    if index is not None and name in index:
+        del index[name]
+
+
+# all payloads with their metadata (sorted by name)
+def listPayloads():
+    payloads = []
+    for name in sorted(index):
+        entry = dict(index[name])
+        entry.pop("settings", None)
+        entry["name"] = name
+        payloads.append(entry)
+    return payloads
@@ -0,0 +1,143 @@
+import os
+
+import storage
+
+# writing payloads to flash
+#  - the filesystem is only remounted writable once for nested writes (e.g. an upload session saving several
+#    payloads), it goes back to read-only when the outermost write is done
+#  - data is buffered and written in whole blocks
+#  - files are written to a temporary file first and only replace the original once complete:
+#    <file>.ddtmp (being written) => <file>.ddnew (complete) => <file>
+#  - leftovers of interrupted writes are cleaned up the next time the filesystem is remounted writable
+#    (only files with these suffixes, other .tmp or .new files belong to someone else)
+
+# size of the blocks written to flash (FAT sector size)
+BLOCK_SIZE = 512
+TEMP_SUFFIX = ".ddtmp"
+COMPLETE_SUFFIX = ".ddnew"
+# directories files are written to (payloads, and the payload index and boot timelines in fd)
+WRITE_DIRECTORIES = ("fd/payloads", "fd")
+
+blockBuffer = bytearray(BLOCK_SIZE)
+writeDepth = 0
+
+
+# make the filesystem writable (nested calls only remount once)
+#  - returns False if the filesystem can't be remounted (mounted as USB drive by the host)
+def openStorage():
+    global writeDepth
+    if not writeDepth:
+        try:
+            storage.remount("/", readonly=False)
+        except Exception:
+            return False
+        recoverWrites()
+    writeDepth += 1
+    return True
+
+
+# end a write started by openStorage (the outermost one remounts the filesystem read-only)
+def closeStorage():
+    global writeDepth
+    writeDepth -= 1
+    if not writeDepth:
+        storage.remount("/", readonly=True)
+
+
+def fileExists(path):
+    try:
+        os.stat(path)
+        return True
+    except OSError:
+        return False
+
+
+# replace a file with its completely written new version
+def replaceFile(completePath, path):
+    if fileExists(path):
+        os.remove(path)
+    os.rename(completePath, path)
+
+
+# finish or discard interrupted writes in all directories files are written to
+#  - complete files (.ddnew) replace their original, partial ones (.ddtmp) are removed
+def recoverWrites(directories=WRITE_DIRECTORIES):
+    for directory in directories:
+        try:
+            names = os.listdir(directory)
+        except OSError:
+            continue
+        for name in names:
+            path = f"{directory}/{name}"
+            try:
+                if name.endswith(COMPLETE_SUFFIX):
+                    replaceFile(path, path[: -len(COMPLETE_SUFFIX)])
+                elif name.endswith(TEMP_SUFFIX):
+                    os.remove(path)
+            except OSError:
+                print("Error trying to recover file: ", path)
+
+
+# write a file through the block buffer, replacing the original only once complete
+#  - the filesystem has to be writable (see openStorage)
+class PayloadWriter:
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path + TEMP_SUFFIX, "wb")
+        self.filled = 0
+
+    def write(self, data):
+        view = memoryview(data)
+        while len(view):
+            # whole blocks go to flash directly if nothing is buffered
+            if not self.filled and len(view) >= BLOCK_SIZE:
+                length = len(view) - len(view) % BLOCK_SIZE
+                self.file.write(view[:length])
+                view = view[length:]
+                continue
+
+            length = min(BLOCK_SIZE - self.filled, len(view))
+            blockBuffer[self.filled : self.filled + length] = view[:length]
+            self.filled += length
+            view = view[length:]
+            if self.filled == BLOCK_SIZE:
+                self.file.write(blockBuffer)
+                self.filled = 0
+
+    # write the rest and replace the original file
+    def commit(self):
+        if self.filled:
+            self.file.write(memoryview(blockBuffer)[: self.filled])
+            self.filled = 0
+        self.file.close()
+        os.rename(self.path + TEMP_SUFFIX, self.path + COMPLETE_SUFFIX)
+        replaceFile(self.path + COMPLETE_SUFFIX, self.path)
+
+    # discard everything written (the original file is kept)
+    def abort(self):
+        self.filled = 0
+        try:
+            self.file.close()
+            os.remove(self.path + TEMP_SUFFIX)
+        except OSError:
+            pass
+
+
+# write a complete file (str or bytes-like content)
+#  - returns True on success
+def writePayload(path, content):
+    if isinstance(content, str):
+        content = content.encode("utf-8")
+    try:
+        writer = PayloadWriter(path)
+    except OSError:
+        print("Error trying to write file: ", path)
+        return False
+    try:
+        writer.write(content)
+        writer.commit()
+        return True
+    except OSError:
+        writer.abort()
+        print("Error trying to write file: ", path)
+        return False
@@ -0,0 +1,90 @@
+import math
+
+from fd.opcodes import (
+    OP_CC_PRESS,
+    OP_CC_RELEASE,
+    OP_CC_SEND,
+    OP_DELAY,
+    OP_IMPORT,
+    OP_KEYS,
+    OP_MOUSE_CLICK,
+    OP_MOUSE_MOVE,
+    OP_MOUSE_PRESS,
+    OP_MOUSE_RELEASE,
+    OP_MOUSE_RELEASEALL,
+    OP_MOUSE_WHEEL,
+    OP_STRING,
+)
+
+# number of most recent durations kept per command type (for percentiles, nearest-rank)
+SAMPLES = 64
+
+# command type of opcodes (everything else is profiled as OTHER)
+commandTypes = {
+    OP_STRING: "STRING",
+    OP_DELAY: "DELAY",
+    OP_IMPORT: "IMPORT",
+    OP_KEYS: "KEYS",
+    OP_MOUSE_MOVE: "MOUSE",
+    OP_MOUSE_WHEEL: "MOUSE",
+    OP_MOUSE_CLICK: "MOUSE",
+    OP_MOUSE_PRESS: "MOUSE",
+    OP_MOUSE_RELEASE: "MOUSE",
+    OP_MOUSE_RELEASEALL: "MOUSE",
+    OP_CC_SEND: "CC",
+    OP_CC_PRESS: "CC",
+    OP_CC_RELEASE: "CC",
+}
+
+# per command type: [count, total ns, min ns, max ns, characters, samples, next sample slot]
+profile = {}
+
+
+# drop all recorded timings
+def resetProfile():
+    profile.clear()
+
+
+# record the runtime of an instruction
+#  - IMPORT timings include all instructions of the imported payload
+def recordInstruction(instruction, ns):
+    commandType = commandTypes.get(instruction[0], "OTHER")
+    entry = profile.get(commandType, None)
+    if entry is None:
+        entry = [0, 0, ns, ns, 0, [], 0]
+        profile[commandType] = entry
+
+    entry[0] += 1
+    entry[1] += ns
+    if ns < entry[2]:
+        entry[2] = ns
+    if ns > entry[3]:
+        entry[3] = ns
+    if instruction[0] == OP_STRING:
+        entry[4] += len(instruction[3])
+
+    # keep the most recent durations
+    if len(entry[5]) < SAMPLES:
+        entry[5].append(ns)
+    else:
+        entry[5][entry[6]] = ns
+        entry[6] = (entry[6] + 1) % SAMPLES
+
+
+# summary of all recorded timings (in milliseconds)
+def profileSummary():
+    commands = {}
+    for commandType, entry in profile.items():
+        samples = sorted(entry[5])
+        summary = {
+            "count": entry[0],
+            "total": round(entry[1] / 1000000, 3),
+            "min": round(entry[2] / 1000000, 3),
+            "max": round(entry[3] / 1000000, 3),
+            "p95": round(samples[max(0, math.ceil(0.95 * len(samples)) - 1)] / 1000000, 3),
+        }
+        if entry[4]:
+            summary["characters_per_second"] = round(entry[4] * 1000000000 / entry[1], 1)
+        commands[commandType] = summary
+
+    return {"unit_of_measurement": "ms", "commands": commands}
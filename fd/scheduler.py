@@ -0,0 +1,70 @@
+import time
+
+from fd.hidReports import waitUntil
+
+# sleep coarsely until this close to a deadline, then busy-wait (in nanoseconds)
+SPIN_NS = 2000000
+
+# absolute deadline (time.monotonic_ns) the schedule has reached
+deadline = 0
+
+# timing statistics of the current schedule
+statistics = {
+    # sum of all requested waits (ns)
+    "requested": 0,
+    # sum of time actually spent waiting (ns)
+    "actual": 0,
+    # number of waits
+    "waits": 0,
+    # waits whose deadline had already passed when they started
+    "overruns": 0,
+    # latest wake-up after a deadline (ns)
+    "maxLateness": 0,
+}
+
+
+# start a new schedule (e.g. at the beginning of a script)
+def resetSchedule():
+    global deadline
+    deadline = time.monotonic_ns()
+    for key in statistics:
+        statistics[key] = 0
+
+
+# move the schedule to the current time
+#  - call after instructions doing actual work (typing, waiting for external events...)
+#  - anything else (parsing, dispatching, logging) is absorbed by the next wait
+def syncSchedule():
+    global deadline
+    now = time.monotonic_ns()
+    if now > deadline:
+        deadline = now
+
+
+# start waiting until the schedule advanced by the provided amount of nanoseconds
+#  - returns the time the wait started
+def beginWait(ns):
+    global deadline
+    deadline += ns
+    start = time.monotonic_ns()
+    if ns and start >= deadline:
+        statistics["overruns"] += 1
+    statistics["requested"] += ns
+    statistics["waits"] += 1
+    return start
+
+
+# time left until the current deadline (ns)
+def remainingWait():
+    return deadline - time.monotonic_ns()
+
+
+# finish a wait started by beginWait (busy-waits for the rest of it)
+def finishWait(start):
+    if deadline > start:
+        now = waitUntil(deadline)
+        if now - deadline > statistics["maxLateness"]:
+            statistics["maxLateness"] = now - deadline
+    else:
+        now = start
+    statistics["actual"] += now - start
@@ -0,0 +1,93 @@
+import binascii
+import json
+
+from fd.htmlHeaders import headersCss, headersHtml, headersJs
+from fd.httpStream import sendResponse
+
+# web UI assets held in RAM
+#  - files are read once (on first request) and kept as bytes, the index page is composed of several files
+#  - responses carry a content hash ETag, revalidation requests (If-None-Match) are answered with 304
+#  - minified + gzipped versions (see tools/bundleWebAssets.py) are served to clients accepting gzip,
+#    as long as they were built from the current files
+
+# asset name: (files to concatenate, response headers)
+assetFiles = {
+    "index": (
+        ("fd/web/header.html", "fd/web/content.html", "fd/web/footer.html"),
+        headersHtml,
+    ),
+    "script.js": (("fd/web/script.js",), headersJs),
+    "style.css": (("fd/web/style.css",), headersCss),
+}
+
+# gzipped assets and the manifest listing the source checksum each one was built from
+BUNDLE_PATH = "fd/web/bundle"
+BUNDLE_MANIFEST = BUNDLE_PATH + "/bundle.json"
+
+# asset name: ((body, ETag), (gzipped body, ETag) or None)
+assets = {}
+bundleManifest = None
+
+
+def checksum(data):
+    return binascii.crc32(data) & 0xFFFFFFFF
+
+
+def readBytes(path):
+    f = open(path, "rb")
+    data = f.read()
+    f.close()
+    return data
+
+
+def loadBundleManifest():
+    try:
+        f = open(BUNDLE_MANIFEST, "r")
+        manifest = json.load(f)
+        f.close()
+        return manifest
+    except (OSError, ValueError):
+        return {}
+
+
+def loadAsset(name):
+    global bundleManifest
+    body = bytearray()
+    for path in assetFiles[name][0]:
+        body.extend(readBytes(path))
+    body = bytes(body)
+    sourceChecksum = checksum(body)
+
+    # gzipped version (only if built from the current files)
+    gzipped = None
+    if bundleManifest is None:
+        bundleManifest = loadBundleManifest()
+    entry = bundleManifest.get(name, None)
+    if entry is not None and entry["source"] == sourceChecksum:
+        try:
+            data = readBytes(entry["file"])
+            gzipped = (data, '"{:08x}"'.format(checksum(data)))
+        except OSError:
+            pass
+
+    assets[name] = ((body, '"{:08x}"'.format(sourceChecksum)), gzipped)
+    return assets[name]
+
+
+# respond with an asset
+#  - requestHeaders: headers of the request (lower case names, as provided by ampule)
+def sendAsset(client, name, requestHeaders):
+    plain, gzipped = assets.get(name, None) or loadAsset(name)
+    headers = dict(assetFiles[name][1])
+    asset = plain
+    if gzipped is not None:
+        headers["Vary"] = "Accept-Encoding"
+        if "gzip" in requestHeaders.get("accept-encoding", ""):
+            asset = gzipped
+            headers["Content-Encoding"] = "gzip"
+    headers["ETag"] = asset[1]
+
+    if requestHeaders.get("if-none-match", None) == asset[1]:
+        sendResponse(client, 304, headers)
+    else:
+        sendResponse(client, 200, headers, asset[0])
@@ -0,0 +1,122 @@
+import struct
+import time
+from array import array
+
+# execution trace of the last script
+#  - one record per executed instruction, kept in a preallocated ring buffer (oldest records are dropped first)
+#  - record fields (all unsigned 32 bit):
+#    file (index into the file table), line number, opcode, start and end (microseconds since trace start),
+#    HID reports sent, garbage collections
+#  - file table: paths of the script and the payloads it IMPORTed, in the order they were first run
+#  - binary export: header (magic, version, records, dropped records, trace start in monotonic_ns, files),
+#    file table (length and UTF-8 encoded path per file), records, everything little-endian
+
+TRACE_MAGIC = b"DDT"
+TRACE_VERSION = 2
+TRACE_HEADER = "<3sBIIQH"
+TRACE_FILE = "<H"
+TRACE_RECORD = "<IIIIIII"
+FIELDS = ("file", "line", "opcode", "start", "end", "reports", "gc")
+
+capacity = 0
+records = array("I")
+head = 0
+count = 0
+dropped = 0
+start = 0
+files = []
+currentFile = 0
+
+
+# set up ring buffer capacity (number of records, 0 disables tracing)
+def configureTracer(traceCapacity):
+    global capacity, records
+    capacity = traceCapacity
+    records = array("I", bytes(4 * len(FIELDS) * capacity))
+    resetTrace()
+
+
+# drop all records and files and restart the trace clock
+def resetTrace():
+    global head, count, dropped, start, currentFile
+    head = count = dropped = currentFile = 0
+    files.clear()
+    start = time.monotonic_ns()
+
+
+# following records belong to the provided file (script or imported payload)
+#  - returns the index of the previous file, to continue with once the import is done (see leaveTraceFile)
+def enterTraceFile(path):
+    global currentFile
+    previous = currentFile
+    if path not in files:
+        files.append(path)
+    currentFile = files.index(path)
+    return previous
+
+
+def leaveTraceFile(previous):
+    global currentFile
+    currentFile = previous
+
+
+# record an executed instruction
+#  - startNs / endNs: time.monotonic_ns before and after the instruction
+def recordTrace(lineNumber, opcode, startNs, endNs, reports, collections):
+    global head, count, dropped
+    i = head * len(FIELDS)
+    records[i] = currentFile
+    records[i + 1] = lineNumber
+    records[i + 2] = opcode
+    records[i + 3] = (startNs - start) // 1000
+    records[i + 4] = (endNs - start) // 1000
+    records[i + 5] = reports
+    records[i + 6] = collections
+
+    head = (head + 1) % capacity
+    if count < capacity:
+        count += 1
+    else:
+        dropped += 1
+
+
+# iterate over all records (oldest first)
+def iterateTrace():
+    first = (head - count) % capacity if capacity else 0
+    for n in range(count):
+        i = ((first + n) % capacity) * len(FIELDS)
+        yield records[i : i + len(FIELDS)]
+
+
+# trace in binary form
+def exportBinary():
+    recordSize = struct.calcsize(TRACE_RECORD)
+    headerSize = struct.calcsize(TRACE_HEADER)
+    names = [path.encode("utf-8") for path in files]
+    tableSize = sum(struct.calcsize(TRACE_FILE) + len(name) for name in names)
+    buffer = bytearray(headerSize + tableSize + count * recordSize)
+    struct.pack_into(TRACE_HEADER, buffer, 0, TRACE_MAGIC, TRACE_VERSION, count, dropped, start, len(names))
+
+    offset = headerSize
+    for name in names:
+        struct.pack_into(TRACE_FILE, buffer, offset, len(name))
+        offset += struct.calcsize(TRACE_FILE)
+        buffer[offset : offset + len(name)] = name
+        offset += len(name)
+    for record in iterateTrace():
+        struct.pack_into(TRACE_RECORD, buffer, offset, *record)
+        offset += recordSize
+    return buffer
+
+
+# trace as JSON serializable dict
+def exportJson():
+    return {
+        "version": TRACE_VERSION,
+        "start": start,
+        "dropped": dropped,
+        "unit_of_measurement": "us",
+        "files": files,
+        "fields": FIELDS,
+        "records": [list(record) for record in iterateTrace()],
+    }
@@ -0,0 +1,50 @@
+import time
+
+import supervisor
+
+# detect when the host is ready to accept keystrokes (instead of sleeping a fixed amount of time)
+#  - USB connection: the host enumerated the device (polled at a fine cadence)
+#  - host ready: the host's HID driver sent its first output report to the keyboard (LED state), which it does
+#    as soon as it picked up the keyboard
+#  - hosts that don't send LED reports on their own (e.g. macOS) are only waited for up to an upper bound
+
+
+# wait for the host to enumerate the device
+#  - timeout / interval: in milliseconds
+#  - progress(elapsed ms) is called every progressInterval milliseconds while waiting
+#  - returns milliseconds waited or None on timeout
+def waitForUsbConnection(timeout, interval, progress=None, progressInterval=500):
+    start = time.monotonic_ns()
+    nextProgress = 0
+    while not supervisor.runtime.usb_connected:
+        elapsed = (time.monotonic_ns() - start) // 1000000
+        if elapsed >= timeout:
+            return None
+        if progress is not None and elapsed >= nextProgress:
+            progress(elapsed)
+            nextProgress = elapsed + progressInterval
+        time.sleep(interval / 1000)
+    return (time.monotonic_ns() - start) // 1000000
+
+
+# wait for the host's first output report to the keyboard device
+#  - timeout / interval: in milliseconds (timeout = upper bound for hosts that never send one)
+#  - returns milliseconds waited and the received report (None on timeout)
+#  - the report is consumed by get_last_received_report: hand it to the keyboard (seedLedStatus),
+#    otherwise its LED state stays empty until the host sends another one
+def waitForHostReport(device, timeout, interval):
+    start = time.monotonic_ns()
+    report = device.get_last_received_report()
+    while report is None:
+        elapsed = (time.monotonic_ns() - start) // 1000000
+        if elapsed >= timeout:
+            return elapsed, None
+        time.sleep(interval / 1000)
+        report = device.get_last_received_report()
+    return (time.monotonic_ns() - start) // 1000000, report
+
+
+# set the LED state of an adafruit_hid Keyboard to a report received before it was created
+def seedLedStatus(keyboard, report):
+    if report is not None:
+        keyboard._led_status = bytearray(report[:1])
@@ -1,28 +1,5 @@
 "use strict";
 
-function encodeForTransport(s) {
-	// convert to UTF-8
-	s = unescape(encodeURIComponent(s));
-
-	// make base64
-	s = btoa(s);
-
-	// encodeURIComponent
-	s = encodeURIComponent(s);
-
-	return s;
-}
-
-function decodeFromTransport(s) {
-	// decode base64
-	s = atob(s);
-
-	// convert from UTF-8
-	s = decodeURIComponent(escape(s));
-
-	return s;
-}
-
 function E(id) {
 	return document.getElementById(id);
 }
@@ -34,19 +11,35 @@ function fetchPayloads() {
 
 	xhr.onreadystatechange = () => {
 		if (xhr.status == 200 && xhr.readyState == 4) {
-			const response = JSON.parse(xhr.responseText).sort();
+			const response = JSON.parse(xhr.responseText);
 			let eList = E("payloadList");
+			eList.innerHTML = "";
 			response.forEach((payload) => {
 				let eListItem = document.createElement("li");
 				let eLink = document.createElement("a");
 				eLink.setAttribute("href", "#");
 				eLink.setAttribute(
 					"onclick",
-					"loadPayload('" + payload + "');"
+					"loadPayload('" + payload.name + "');"
+				);
+				eLink.setAttribute(
+					"title",
+					payload.lines +
+						" lines, " +
+						payload.size +
+						" bytes" +
+						(payload.imports.length
+							? ", imports " + payload.imports.join(", ")
+							: "")
 				);
-				eLink.innerText = payload;
+				eLink.innerText = payload.name;
+
+				let eEstimate = document.createElement("span");
+				eEstimate.setAttribute("class", "payload-estimate");
+				eEstimate.innerText = "~" + payload.estimate / 1000 + "s";
 
 				eListItem.appendChild(eLink);
+				eListItem.appendChild(eEstimate);
 				eList.appendChild(eListItem);
 			});
 
@@ -97,6 +90,22 @@ function fetchStatistics() {
 			E("memory_available_percentage").innerText =
 				m.relative.available + m.relative.unit_of_measurement;
 
+			// phases of the current boot (ms since start, duration)
+			let eBoot = E("boot_timeline");
+			while (eBoot.rows.length > 1) {
+				eBoot.deleteRow(1);
+			}
+			for (const phase of response.boot.current) {
+				let eRow = eBoot.insertRow();
+				eRow.insertCell().innerText = phase.phase;
+				let eAt = eRow.insertCell();
+				eAt.innerText = phase.at + " " + response.boot.unit_of_measurement;
+				eAt.setAttribute("class", "align_right");
+				let eDuration = eRow.insertCell();
+				eDuration.innerText = "+" + phase.duration;
+				eDuration.setAttribute("class", "align_right");
+			}
+
 			if (response.usb_connected) {
 				E("usb_hid_connection").style.display = "none";
 				if (pollUsbHid) {
@@ -140,9 +149,8 @@ function loadPayload(filename) {
 
 	xhr.onreadystatechange = () => {
 		if (xhr.status == 200 && xhr.readyState == 4) {
-			const response = JSON.parse(xhr.responseText);
 			let eCode = E("payloadCode");
-			eCode.value = decodeFromTransport(response.payload);
+			eCode.value = xhr.responseText;
 			let eFilename = E("payloadFilename");
 			eFilename.innerText = "file: " + filename;
 			eFilename.setAttribute("class", "notification background_gray");
@@ -157,39 +165,168 @@ function loadPayload(filename) {
 
 function runPayload() {
 	let xhr = new XMLHttpRequest();
-	xhr.open("POST", "/api/runPayload", true);
+	xhr.open("POST", "/api/runUpload", true);
 	xhr.responseType = "";
-	xhr.setRequestHeader("Content-Type", "application/x-www-form-urlencoded");
+	xhr.setRequestHeader("Content-Type", "application/octet-stream");
 
 	xhr.onreadystatechange = () => {
-		if (xhr.status == 200 && xhr.readyState == 4) {
-			const response = JSON.parse(xhr.responseText);
-
-			let eResult = E("payloadResult");
-			let eNotification = E("payloadNotification");
-			eResult.value = decodeFromTransport(response.result);
-			eNotification.innerText = response.notification;
-			eNotification.setAttribute(
-				"class",
-				"notification background_green"
-			);
+		if (xhr.readyState != 4) {
+			return;
+		}
 
-			const eCode = E("payloadCode");
-			document.body.style.cursor = "default";
-			eCode.disabled = false;
-			eResult.disabled = false;
+		const response = JSON.parse(xhr.responseText);
+		let eNotification = E("payloadNotification");
+		eNotification.innerText = response.notification;
+		if (xhr.status == 200) {
+			eNotification.setAttribute("class", "notification background_gray");
+			runningJob = response.job;
+			E("payloadCancel").disabled = false;
+			streamOutput(response.job);
+			setTimeout(pollJob, 500);
+		} else {
+			eNotification.setAttribute("class", "notification background_red");
+			finishRun();
 		}
 	};
 
 	const eCode = E("payloadCode");
 	const eResult = E("payloadResult");
-	const postParams = "payload=" + encodeForTransport(eCode.value);
 
 	document.body.style.cursor = "progress";
 	eCode.disabled = true;
 	eResult.value = "";
 	eResult.disabled = true;
-	xhr.send(postParams);
+	xhr.send(eCode.value);
+}
+
+// estimate the runtime without running the script (nothing is typed)
+function dryRunPayload() {
+	let xhr = new XMLHttpRequest();
+	xhr.open("POST", "/api/dryRun", true);
+	xhr.responseType = "";
+	xhr.setRequestHeader("Content-Type", "application/octet-stream");
+
+	xhr.onreadystatechange = () => {
+		if (xhr.readyState != 4) {
+			return;
+		}
+
+		const response = JSON.parse(xhr.responseText);
+		let eNotification = E("payloadNotification");
+		if (xhr.status == 200) {
+			eNotification.innerText =
+				"Estimated runtime: ~" + response.estimate / 1000 + "s";
+			eNotification.setAttribute(
+				"class",
+				response.unresolved.length
+					? "notification background_red"
+					: "notification background_gray"
+			);
+
+			let lines = [
+				"delays: " + response.delays + " ms",
+				"input: " + response.input + " ms (" + response.reports + " HID reports)",
+				"instructions: " + response.instructions,
+				"imports: " + (response.imports.join(", ") || "-"),
+			];
+			for (const entry of response.untimed) {
+				lines.push("untimed: " + entry.payload + ":" + entry.line + " " + entry.command);
+			}
+			for (const entry of response.unresolved) {
+				lines.push("unresolved: " + entry.payload + ":" + entry.line + " " + entry.name);
+			}
+			E("payloadResult").value = lines.join("\n");
+		} else {
+			eNotification.innerText = response.notification;
+			eNotification.setAttribute("class", "notification background_red");
+		}
+		document.body.style.cursor = "default";
+	};
+
+	document.body.style.cursor = "progress";
+	xhr.send(E("payloadCode").value);
+}
+
+function pollJob() {
+	let xhr = new XMLHttpRequest();
+	xhr.open("GET", "/api/jobStatus?id=" + runningJob);
+	xhr.responseType = "";
+
+	xhr.onreadystatechange = () => {
+		if (xhr.status == 200 && xhr.readyState == 4) {
+			const response = JSON.parse(xhr.responseText);
+			let eNotification = E("payloadNotification");
+
+			if (response.state === "running") {
+				eNotification.innerText =
+					"Running line " +
+					response.line +
+					" (" +
+					response.progress +
+					"%, " +
+					response.elapsed +
+					"s)...";
+				setTimeout(pollJob, 500);
+				return;
+			}
+
+			if (response.state === "finished") {
+				eNotification.innerText =
+					"Script ran successfully in " +
+					response.elapsed +
+					"s. See script output below.";
+				eNotification.setAttribute(
+					"class",
+					"notification background_green"
+				);
+			} else {
+				eNotification.innerText = response.error
+					? "Script " + response.state + ": " + response.error + "."
+					: "Script " + response.state + " in line " + response.line + ".";
+				eNotification.setAttribute(
+					"class",
+					"notification background_red"
+				);
+			}
+			finishRun();
+		}
+	};
+
+	xhr.send();
+}
+
+function streamOutput(job) {
+	const eResult = E("payloadResult");
+	const source = new EventSource("/api/jobOutput?id=" + job);
+
+	source.onmessage = (event) => {
+		eResult.value += event.data + "\n";
+		eResult.scrollTop = eResult.scrollHeight;
+	};
+	source.addEventListener("end", () => {
+		source.close();
+	});
+}
+
+function cancelPayload() {
+	if (runningJob === null) {
+		return;
+	}
+
+	let xhr = new XMLHttpRequest();
+	xhr.open("POST", "/api/cancelJob", true);
+	xhr.responseType = "";
+	xhr.setRequestHeader("Content-Type", "application/x-www-form-urlencoded");
+	E("payloadCancel").disabled = true;
+	xhr.send("id=" + runningJob);
+}
+
+function finishRun() {
+	runningJob = null;
+	E("payloadCancel").disabled = true;
+	E("payloadCode").disabled = false;
+	E("payloadResult").disabled = false;
+	document.body.style.cursor = "default";
 }
 
 function newPayload() {
@@ -211,13 +348,20 @@ function savePayload() {
 		eFilename.innerText = window.prompt("Enter filename: ");
 	}
 
+	const filename = eFilename.innerText.replace(/^file: /, "");
+
 	let xhr = new XMLHttpRequest();
-	xhr.open("POST", "/api/savePayload", true);
+	xhr.open(
+		"POST",
+		"/api/uploadPayload?file=" + encodeURIComponent(filename),
+		true
+	);
 	xhr.responseType = "";
-	xhr.setRequestHeader("Content-Type", "application/x-www-form-urlencoded");
+	xhr.setRequestHeader("Content-Type", "application/octet-stream");
 
+	// invalid file names are rejected with 400 (and a notification)
 	xhr.onreadystatechange = () => {
-		if (xhr.status == 200 && xhr.readyState == 4) {
+		if ((xhr.status == 200 || xhr.status == 400) && xhr.readyState == 4) {
 			const response = JSON.parse(xhr.responseText);
 
 			let eNotification = E("payloadNotification");
@@ -227,6 +371,7 @@ function savePayload() {
 					"class",
 					"notification background_green"
 				);
+				fetchPayloads();
 			} else {
 				eNotification.setAttribute(
 					"class",
@@ -242,17 +387,82 @@ function savePayload() {
 
 	const eCode = E("payloadCode");
 	const eNotification = E("payloadNotification");
-	const postParams =
-		"filename=" +
-		encodeForTransport(eFilename.innerText) +
-		"&payload=" +
-		encodeForTransport(eCode.value);
-
 	document.body.style.cursor = "progress";
 	eCode.disabled = true;
 	eNotification.innerText = "";
 	eNotification.setAttribute("class", "");
-	xhr.send(postParams);
+	xhr.send(eCode.value);
+}
+
+function deletePayload() {
+	const eFilename = E("payloadFilename");
+	const filename = eFilename.innerText.replace(/^file: /, "");
+	if (filename === "" || !window.confirm("Delete " + filename + "?")) {
+		return;
+	}
+
+	let xhr = new XMLHttpRequest();
+	xhr.open(
+		"POST",
+		"/api/deletePayload?file=" + encodeURIComponent(filename),
+		true
+	);
+	xhr.responseType = "";
+
+	xhr.onreadystatechange = () => {
+		if ((xhr.status == 200 || xhr.status == 400) && xhr.readyState == 4) {
+			const response = JSON.parse(xhr.responseText);
+			if (response.result === "success") {
+				newPayload();
+				fetchPayloads();
+			}
+
+			let eNotification = E("payloadNotification");
+			eNotification.innerText = response.notification;
+			eNotification.setAttribute(
+				"class",
+				response.result === "success"
+					? "notification background_green"
+					: "notification background_red"
+			);
+		}
+	};
+
+	xhr.send();
+}
+
+function downloadTrace(format) {
+	let xhr = new XMLHttpRequest();
+	xhr.open("GET", "/api/trace?format=" + format);
+	xhr.responseType = "";
+
+	xhr.onreadystatechange = () => {
+		if (xhr.status == 200 && xhr.readyState == 4) {
+			let blob;
+			if (format === "binary") {
+				// binary traces are transported base64 encoded
+				const trace = atob(JSON.parse(xhr.responseText).trace);
+				let bytes = new Uint8Array(trace.length);
+				for (let i = 0; i < trace.length; i++) {
+					bytes[i] = trace.charCodeAt(i);
+				}
+				blob = new Blob([bytes], { type: "application/octet-stream" });
+			} else {
+				blob = new Blob([xhr.responseText], { type: "application/json" });
+			}
+
+			let eLink = document.createElement("a");
+			eLink.setAttribute("href", URL.createObjectURL(blob));
+			eLink.setAttribute("download", format === "binary" ? "trace.ddt" : "trace.json");
+			eLink.click();
+			URL.revokeObjectURL(eLink.href);
+
+			document.body.style.cursor = "default";
+		}
+	};
+
+	document.body.style.cursor = "progress";
+	xhr.send();
 }
 
 function init() {
@@ -261,3 +471,4 @@ function init() {
 }
 
 let pollUsbHid;
+let runningJob = null;
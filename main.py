@@ -13,56 +13,91 @@
 #  - detailed debugging through serial monitor
 #  - display support
 
+from fd.bootTimeline import (
+    bootTimeline,
+    markPhase,
+    printTimeline,
+    saveTimeline,
+    takeHandover,
+    timelineHistory,
+)
+
+markPhase("main")
+
 import binascii
 import gc
-import json
 import os
 import random
-import re
 import time
 
-import ampule
-import socketpool
 import supervisor
-import storage
 import usb_hid
-import wifi
+from adafruit_hid import find_device
 from adafruit_hid.consumer_control import ConsumerControl
-from adafruit_hid.consumer_control_code import ConsumerControlCode
 from adafruit_hid.keyboard import Keyboard
-from adafruit_hid.keyboard_layout_us import KeyboardLayoutUS as KeyboardLayout
-from adafruit_hid.keycode import Keycode
 from adafruit_hid.mouse import Mouse
 from board import *
 from digitalio import DigitalInOut, Direction, Pull
 
-# import configuration
-try:
-    from fd.config import config
-except ImportError:
-    print(
-        "Using default configuration (config_default.py). To use your own settings copy as config.py and modify to taste."
-    )
-    from fd.config_default import config
-
-from fd.consumerControlCommands import consumerControlCommands
-from fd.duckyCommands import duckyCommands
-from fd.htmlHeaders import headersAuth, headersCss, headersHtml, headersJs, headersJson
-from fd.mouseButtons import mouseButtons
-from fd.unquote import unquote
+# import configuration (missing settings are taken from config_default.py)
+from fd.configuration import loadConfig
+
+config = loadConfig()
+
+markPhase("main config")
+if config["bootTimeline"]["enabled"]:
+    takeHandover(config["bootTimeline"]["nvmOffset"])
+
+from fd.logger import (
+    DEBUG,
+    clearLog,
+    configureLogger,
+    debug,
+    error,
+    formatRecord,
+    info,
+    isEnabled,
+    logSequence,
+    recordsSince,
+    warning,
+)
+from fd.opcodes import (
+    OP_BLINKLED,
+    OP_CALIBRATE,
+    OP_CC_PRESS,
+    OP_CC_RELEASE,
+    OP_CC_SEND,
+    OP_DEFAULTDELAY,
+    OP_DELAY,
+    OP_HOSTPROFILE,
+    OP_IMPORT,
+    OP_KEYS,
+    OP_LED,
+    OP_LOCALE,
+    OP_MOUSE_CLICK,
+    OP_MOUSE_MOVE,
+    OP_MOUSE_PRESS,
+    OP_MOUSE_RELEASE,
+    OP_MOUSE_RELEASEALL,
+    OP_MOUSE_WHEEL,
+    OP_NOOP,
+    OP_PRINT,
+    OP_PSYCHOMOUSE,
+    OP_REPEAT,
+    OP_STRING,
+    OP_TYPINGINTERVAL,
+    OP_WAITFORLED,
+    OP_WAITFORWIFI,
+)
+from fd.payloadStorage import PayloadWriter, closeStorage, openStorage, writePayload
+from fd.usbReadiness import seedLedStatus, waitForHostReport, waitForUsbConnection
+
+markPhase("imports")
 
 # -----------------------------------------------------------------------------------------------------
 # Ducky Script Processing / HID Injection
 # -----------------------------------------------------------------------------------------------------
 
-def myprint(msg, store=True):
-    global duckyScriptResult
-
-    print(msg)
-    if store:
-        duckyScriptResult = duckyScriptResult + msg + "\r\n"
-
-
 # check if provided pin is grounded
 def isPinGrounded(pin):
     checkPin = DigitalInOut(pin)
@@ -70,23 +105,24 @@ def isPinGrounded(pin):
     return not checkPin.value
 
 
-# sleep a short amount of time (and add to global delay counter)
-def delay(seconds):
+# wait X nanoseconds as steps of a running script
+#  - yields the remaining time as long as it's long enough to do something else in the meantime
+def delaySteps(ns):
     global delayCounter
-    time.sleep(seconds)
-    delayCounter += seconds
-
+    start = beginWait(ns)
+    remaining = remainingWait()
+    while remaining > SPIN_NS:
+        yield remaining
+        remaining = remainingWait()
+    finishWait(start)
+    delayCounter += ns / 1000000000
 
-# split string into list tokens and make 1st token UPPERCASE
-def splitToTokens(line):
-    tokens = line.split(" ")
-    tokens[0] = tokens[0].upper()
-    return tokens
 
-
-# join list of tokens to a string
-def joinTokens(tokens, start=0):
-    return " ".join(tokens[start:])
+# run the steps of a script to completion (sleeping through long waits)
+def runSteps(steps):
+    for remaining in steps:
+        if remaining > SPIN_NS:
+            time.sleep((remaining - SPIN_NS) / 1000000000)
 
 
 # pick a random delay time
@@ -100,13 +136,23 @@ def pickRandomDelay():
     )
 
 
-# blink onboard LED
+# blink onboard LED (mouse jiggler, doesn't need the scheduler of running scripts)
 def blinkLED(duration=0.2, repeats=1):
     for i in range(repeats):
         led.value = True
-        delay(duration)
+        time.sleep(duration)
+        led.value = False
+        time.sleep(duration)
+
+
+# blink onboard LED (as steps of a running script)
+def blinkLEDSteps(duration=0.2, repeats=1):
+    syncSchedule()
+    for i in range(repeats):
+        led.value = True
+        yield from delaySteps(int(duration * 1000000000))
         led.value = False
-        delay(duration)
+        yield from delaySteps(int(duration * 1000000000))
 
 
 # infinitely jiggle mouse ever so often
@@ -118,21 +164,21 @@ def mouseJigglerLoop():
             config["mouseJiggler"]["LED"]["startupIndicator"]["repetitions"],
         )
 
-    myprint("")
-    myprint("Running mouse jiggler")
-    myprint("--------------------------------")
-    myprint(" > movement  =", config["mouseJiggler"]["movement"], "pixels")
-    myprint(" > delay min =", config["mouseJiggler"]["delayMinimum"], "seconds")
-    myprint(" > delay max =", config["mouseJiggler"]["delayMaximum"], "seconds")
-    myprint("--------------------------------")
+    info("")
+    info("Running mouse jiggler")
+    info("--------------------------------")
+    info(" > movement  = {} pixels", config["mouseJiggler"]["movement"])
+    info(" > delay min = {} seconds", config["mouseJiggler"]["delayMinimum"])
+    info(" > delay max = {} seconds", config["mouseJiggler"]["delayMaximum"])
+    info("--------------------------------")
 
     timestamp, delay = pickRandomDelay()
 
-    myprint("waiting", delay, "seconds...")
+    debug("waiting {} seconds...", delay)
     while True:
         if (time.monotonic() - timestamp) > delay:
             # move mouse up+left then back down+right
-            myprint("jiggling mouse", config["mouseJiggler"]["movement"], "pixels")
+            debug("jiggling mouse {} pixels", config["mouseJiggler"]["movement"])
             mouse.move(
                 x=config["mouseJiggler"]["movement"] * -1,
                 y=config["mouseJiggler"]["movement"] * -1,
@@ -148,143 +194,36 @@ def mouseJigglerLoop():
 
             # determine delay
             timestamp, delay = pickRandomDelay()
-            myprint("waiting", delay, "seconds...")
+            debug("waiting {} seconds...", delay)
 
 
 # dynamically load the provided keyboard locale
+#  - precomputes the keystroke table of its keyboard layout (kept in the layout cache)
 def loadLocale(locale):
-    global KeyboardLayout, Keycode, kbd_layout
-    if locale.upper() == "US":
-        moduleKeyboardLayout = __import__(
-            "adafruit_hid.keyboard_layout_us", globals(), locals(), ["KeyboardLayoutUS"]
-        )
-        moduleKeycode = __import__(
-            "adafruit_hid.keycode", globals(), locals(), ["Keycode"]
-        )
-        KeyboardLayout = moduleKeyboardLayout.KeyboardLayoutUS
-        Keycode = moduleKeycode.Keycode
-    else:
-        moduleKeyboardLayout = __import__(
-            "keyboard_layout_win_" + locale.lower(),
-            globals(),
-            locals(),
-            ["KeyboardLayout"],
-        )
-        moduleKeycode = __import__(
-            "keycode_win_" + locale.lower(), globals(), locals(), ["Keycode"]
-        )
-        KeyboardLayout = moduleKeyboardLayout.KeyboardLayout
-        Keycode = moduleKeycode.Keycode
-    kbd_layout = KeyboardLayout(kbd)
-
-
-# convert to keycodes
-def convertLineToKeycodes(line):
-    keycodes = []
-    # loop on each key - the filter removes empty values
-    for key in filter(None, line.split(" ")):
-        key = key.upper()
-        # find the keycode for the command in the list
-        command_keycode = duckyCommands.get(key, None)
-        if command_keycode is not None:
-            # if it exists in the list, use it
-            keycodes.append(command_keycode)
-        elif hasattr(Keycode, key):
-            # if it's in the Keycode module, use it (allows any valid keycode)
-            keycodes.append(getattr(Keycode, key))
-        else:
-            # if it's not a known key name, show the error for diagnosis
-            myprint(f"Unknown key: <{key}>")
-    myprint(f"{line} (keycodes = {keycodes})")
-    return keycodes
-
-
-# build OR-ed list of mouse buttons to click/press/release
-def convertLineToMouseButtons(line):
-    buttons = 0
-    for button in filter(None, line.split(" ")):
-        buttons |= mouseButtons.get(button, None)
-    return buttons
+    global currentLocale
+    loadLayout(locale)
+    currentLocale = locale
 
 
 # perform a keyboard action (press keys provided in keycode list)
-def performKeyboardAction(keycodes):
+#  - sends the precompiled report at once followed by a single release
+#  - presses keys one after another if configured (for hosts that rely on the order)
+def performKeyboardAction(keycodes, report=None):
+    if report is not None and config["hid"]["singleReportCombos"]:
+        pressAndRelease(keyboardDevice, report, reportInterval)
+        return
+
     for keycode in keycodes:
         kbd.press(keycode)
     kbd.release_all()
 
 
-# perform a mouse action (move, scroll, click, press, release)
-def performMouseAction(line):
-    # split line into tokens (0 = command, 1-x = parameters)
-    tokens = splitToTokens(line)
-
-    # move mouse pointer
-    if tokens[0] == "MOVE":
-        moveX = int(tokens[1])
-        moveY = int(tokens[2])
-        myprint(f"MOUSE {line} (x={moveX}, y={moveY})")
-        mouse.move(x=moveX, y=moveY)
-
-    # scroll mouse wheel
-    elif tokens[0] == "WHEEL":
-        amount = int(joinTokens(tokens, 1))
-        myprint(f"MOUSE {line}")
-        mouse.move(wheel=amount)
-
-    # click and release one or more mouse buttons
-    elif tokens[0] == "CLICK":
-        mouse_buttons = convertLineToMouseButtons(joinTokens(tokens, 1))
-        myprint(f"MOUSE {line} (buttons = {mouse_buttons})")
-        mouse.click(mouse_buttons)
-
-    # press (and don't release) one or more mouse buttons
-    elif tokens[0] == "PRESS":
-        mouse_buttons = convertLineToMouseButtons(joinTokens(tokens, 1))
-        myprint(f"MOUSE {line} (buttons = {mouse_buttons})")
-        mouse.press(mouse_buttons)
-
-    # release one or more mouse buttons
-    elif tokens[0] == "RELEASE":
-        mouse_buttons = convertLineToMouseButtons(joinTokens(tokens, 1))
-        myprint(f"MOUSE {line} (buttons = {mouse_buttons})")
-        mouse.release(mouse_buttons)
-
-    # release all mouse buttons
-    elif tokens[0] == "RELEASEALL":
-        myprint(f"MOUSE RELEASEALL")
-        mouse.release_all()
-
-
-# perform a consumer control action
-def performConsumerControlAction(line):
-    # split line into tokens (0 = command, 1-x = parameters)
-    tokens = splitToTokens(line)
-
-    # send cc action
-    if tokens[0] == "SEND":
-        consumer_code = consumerControlCommands.get(joinTokens(tokens, 1))
-        myprint(f"CC {line} (code = {consumer_code})")
-        cc.send(consumer_code)
-
-    # press (and don't release) one or more mouse buttons
-    elif tokens[0] == "PRESS":
-        consumer_code = consumerControlCommands.get(joinTokens(tokens, 1))
-        myprint(f"CC {line} (code = {consumer_code})")
-        cc.press(consumer_code)
-
-    # release currently  pressed cc (only one can be pressed at a time)
-    elif tokens[0] == "RELEASE":
-        myprint(f"CC RELEASE")
-        cc.release()
-
-
-# type out provided string
-#  - randomly moves mouse in psychoMouse mode
+# type out provided string (using its precompiled keystrokes)
+#  - randomly moves mouse in psychoMouse mode (every X keystrokes)
 #  - stops time to type out the provided string
-def typeString(s):
-    prefix = s[0:32] + ("..." if len(s) > 32 else "")
-    myprint(f"STRING {prefix}")
+def typeString(s, strokes):
+    if isEnabled(DEBUG):
+        debug("STRING {}{}", s[0:32], "..." if len(s) > 32 else "")
     stopwatch = time.monotonic()
 
     if psychoMouse:
@@ -295,31 +234,41 @@ def typeString(s):
                     -1 * config["psychoMouse"]["range"], config["psychoMouse"]["range"]
                 )
             )
+        chunkSize = 2 * config["psychoMouse"]["characters"]
         i = pos = 0
-        while pos < len(s):
-            kbd_layout.write(s[pos : (pos + config["psychoMouse"]["characters"])])
+        while pos < len(strokes):
+            sendStrokes(
+                keyboardDevice,
+                strokes,
+                pos,
+                min(pos + chunkSize, len(strokes)),
+                reportInterval,
+            )
             mouse.move(
                 x=rand[i % config["psychoMouse"]["randomMovements"]],
                 y=rand[(i + 1) % config["psychoMouse"]["randomMovements"]],
             )
             i += 1
-            pos += config["psychoMouse"]["characters"]
+            pos += chunkSize
     else:
-        kbd_layout.write(s)
+        sendStrokes(keyboardDevice, strokes, reportInterval=reportInterval)
 
     stopwatch = time.monotonic() - stopwatch
     if stopwatch > 1:
-        myprint(f" -> {len(s)} characters in {round(stopwatch, 2)} seconds")
+        debug(" -> {} characters in {} seconds", len(s), round(stopwatch, 2))
     else:
-        myprint(f" -> {len(s)} characters in {round(1000 * stopwatch, 2)} milliseconds")
+        debug(" -> {} characters in {} milliseconds", len(s), round(1000 * stopwatch, 2))
 
 
-# wait for presence of give Wifi Access Point
-def waitForWifiAP(ssid, bssid=None, minimumRssi=None):
+# wait for presence of give Wifi Access Point (as steps of a running script)
+#  - yields after every access point found and between scans
+def waitForWifiAPSteps(ssid, bssid=None, minimumRssi=None):
 
-    myprint("")
-    myprint(f'Waiting for Wifi AP "{ssid}"...')
-    myprint("--------------------------------------------------")
+    info("")
+    info('Waiting for Wifi AP "{}"...', ssid)
+    info("--------------------------------------------------")
+
+    import wifi
 
     stopwatch = time.monotonic()
 
@@ -367,203 +316,705 @@ def waitForWifiAP(ssid, bssid=None, minimumRssi=None):
                 )
 
                 stopwatch = time.monotonic() - stopwatch
-                myprint(
-                    f" --> Access Point present after {round(stopwatch, 2)} seconds"
-                )
-                myprint(f"     * SSID:  {ap.ssid}")
-                myprint(f"     * BSSID: {bssid}")
-                myprint(f"     * RSSI:  {ap.rssi}")
+                info(" --> Access Point present after {} seconds", round(stopwatch, 2))
+                info("     * SSID:  {}", ap.ssid)
+                info("     * BSSID: {}", bssid)
+                info("     * RSSI:  {}", ap.rssi)
 
                 wifi.radio.stop_scanning_networks()
                 return True
 
+            yield 0
+
         wifi.radio.stop_scanning_networks()
-        delay(2)
+        syncSchedule()
+        yield from delaySteps(2000000000)
+
+
+# run a single compiled duckyscript instruction (as steps)
+#  - handlers of instructions taking a while (DELAY, IMPORT) are generators, their steps are passed on
+#  - the schedule is moved along after instructions doing actual work
+#  - runtime is recorded per command type if profiling is enabled
+#  - every instruction is added to the execution trace if tracing is enabled
+#    (a collection is assumed if more memory is free after the instruction than before)
+def instructionSteps(instruction):
+    execution["line"] = instruction[1]
+    if instrumented:
+        reports = reportCount()
+        memoryFree = gc.mem_free()
+        start = time.monotonic_ns()
+        steps = instructionHandlers[instruction[0]](instruction)
+        if steps is not None:
+            yield from steps
+        end = time.monotonic_ns()
+        if profiling:
+            recordInstruction(instruction, end - start)
+        if tracing:
+            recordTrace(
+                instruction[1],
+                instruction[0],
+                start,
+                end,
+                reportCount() - reports,
+                1 if gc.mem_free() > memoryFree else 0,
+            )
+    else:
+        steps = instructionHandlers[instruction[0]](instruction)
+        if steps is not None:
+            yield from steps
+    if instruction[0] in synchronizingOpcodes:
+        syncSchedule()
 
 
-# process a line of duckyscript
-def processLine(line):
-    global defaultDelay, psychoMouse, config
+def executeNoop(instruction):
+    pass
 
-    # split line into tokens (0 = command, 1-x = parameters)
-    tokens = splitToTokens(line)
 
-    # comment => ignore them
-    if tokens[0] == "REM":
-        pass
+# wait X milliseconds
+def executeDelay(instruction):
+    yield from delaySteps(instruction[3])
 
-    # wait X milliseconds
-    elif tokens[0] == "DELAY":
-        delay(float(tokens[1]) / 1000)
 
-    # output a string directly
-    elif tokens[0] == "STRING":
-        typeString(joinTokens(tokens, 1))
+# output a string directly (including ENTER for STRINGLN)
+def executeString(instruction):
+    typeString(instruction[3], instruction[4])
 
-    # output a string with carriage return directly
-    elif tokens[0] == "STRINGLN":
-        typeString(joinTokens(tokens, 1))
-        performKeyboardAction(convertLineToKeycodes("ENTER"))
 
-    # print out statement
-    elif tokens[0] == "PRINT":
-        myprint(f"[SCRIPT]: {joinTokens(tokens, 1)}")
+# print out statement
+def executePrint(instruction):
+    info("[SCRIPT]: {}", instruction[3])
 
-    # set default delay
-    elif tokens[0] == "DEFAULTDELAY" or tokens[0] == "DEFAULT_DELAY":
-        defaultDelay = int(tokens[1]) * 10
 
-    # control the LED
-    elif tokens[0] == "LED":
-        # toggle if there are not parameters
-        if len(tokens) == 1:
-            led.value = not led.value
-        # enable or disable LED otherwise
-        else:
-            led.value = True if tokens[1].upper() == "ON" else False
-
-    # control the LED
-    elif tokens[0] == "BLINK_LED":
-        if len(tokens) == 1:
-            blinkLED()
-        elif len(tokens) == 2:
-            blinkLED(duration=(float(tokens[1]) / 1000))
-        elif len(tokens) == 3:
-            blinkLED(duration=(float(tokens[1]) / 1000), repeats=float(tokens[2]))
-
-    # import another duckyscript payload
-    elif tokens[0] == "IMPORT":
-        processDuckyScript(tokens[1], initialCall=False)
-
-    # switch locale
-    elif tokens[0] == "LOCALE":
-        loadLocale(tokens[1])
-
-    # control mouse
-    elif tokens[0] == "MOUSE":
-        performMouseAction(joinTokens(tokens, 1))
-
-    # consumer control command
-    elif tokens[0] == "CC":
-        performConsumerControlAction(joinTokens(tokens, 1))
-
-    # control psychoMouse mode
-    elif tokens[0] == "PSYCHOMOUSE":
-        # enable psychoMouse mode
-        psychoMouse = True
-        if len(tokens) > 1:
-            # disable psychoMouse mode
-            if tokens[1] == "OFF":
-                psychoMouse = False
-
-            # set psychoMouse settings
-            else:
-                config["psychoMouse"]["characters"] = int(tokens[1])
-                if len(tokens) > 2:
-                    config["psychoMouse"]["range"] = int(tokens[2])
-
-    elif tokens[0] == "WAITFORWIFI":
-        waitForWifiAP(joinTokens(tokens, 1))
-
-    elif tokens[0] == "WAITFORLED":
-        ledCodes = {
-            "CAPS_LOCK": Keyboard.LED_CAPS_LOCK,
-            "COMPOSE": Keyboard.LED_COMPOSE,
-            "NUM_LOCK": Keyboard.LED_NUM_LOCK,
-            "SCROLL_LOCK": Keyboard.LED_SCROLL_LOCK,
-        }
-        ledCode = ledCodes[tokens[1].upper()]
-        ledState = (tokens[2].upper() == "ON")
+# set default delay
+def executeDefaultDelay(instruction):
+    global defaultDelay
+    defaultDelay = instruction[3]
+
+
+# set interval between HID reports when typing (in nanoseconds)
+def executeTypingInterval(instruction):
+    global reportInterval
+    reportInterval = instruction[3]
+
+
+# apply a stored host profile (calibrated report interval)
+#  - returns True if the profile exists
+def applyHostProfile(name):
+    global reportInterval, hostProfiles
+
+    if hostProfiles is None:
+        from fd.calibration import loadHostProfiles
+
+        hostProfiles = loadHostProfiles()
+
+    if name not in hostProfiles:
+        return False
+
+    reportInterval = hostProfiles[name]["reportInterval"] * 1000
+    return True
+
+
+# determine the fastest report interval the host accepts through its lock key LED echo
+#  - stores the result as host profile (if a name was provided)
+def executeCalibrate(instruction):
+    global reportInterval, hostProfiles
+    from fd.calibration import calibrate, loadHostProfiles, saveHostProfiles
+
+    settings = config["calibration"]
+    info("Calibrating report interval using {}...", settings["lockKey"])
+    result = calibrate(
+        keyboardDevice,
+        kbd.led_on,
+        keyboardLedKeys[settings["lockKey"]],
+        keyboardLeds[settings["lockKey"]],
+        [interval * 1000 for interval in settings["intervals"]],
+        toggles=settings["toggles"],
+        rounds=settings["rounds"],
+        timeout=settings["timeout"] * 1000000,
+        safetyFactor=settings["safetyFactor"],
+    )
+
+    if result is None:
+        warning(" -> host didn't echo the LED state, keeping current report interval")
+        return
+
+    reportInterval = result["reportInterval"] * 1000
+    info(" -> using report interval of {} us", result["reportInterval"])
+
+    if instruction[3]:
+        if hostProfiles is None:
+            hostProfiles = loadHostProfiles()
+        hostProfiles[instruction[3]] = result
+        if not openStorage():
+            warning(" -> can't store host profile (USB drive is mounted on the host)")
+            return
+        saveHostProfiles(hostProfiles)
+        closeStorage()
+        info(' -> stored as host profile "{}"', instruction[3])
+
+
+def executeHostProfile(instruction):
+    if applyHostProfile(instruction[3]):
+        info('Using host profile "{}" (report interval = {} us)', instruction[3], reportInterval // 1000)
+    else:
+        warning('Unknown host profile "{}"', instruction[3])
 
-        myprint(f"Waiting for {tokens[1].upper()} LED to be {tokens[2].lower()}...")
-        while True:
-            if kbd.led_on(ledCode) == ledState:
-                break
-            delay(0.1)
 
-    # no recognized special command => just run the converted keycodes
+# control the LED (toggle if no state was provided)
+def executeLed(instruction):
+    if instruction[3] is None:
+        led.value = not led.value
     else:
-        performKeyboardAction(convertLineToKeycodes(line))
+        led.value = instruction[3]
+
+
+def executeBlinkLed(instruction):
+    yield from blinkLEDSteps(duration=instruction[3], repeats=instruction[4])
+
+
+# import another duckyscript payload
+def executeImport(instruction):
+    yield from duckyScriptSteps(instruction[3], initialCall=False)
+
+
+# switch locale
+def executeLocale(instruction):
+    loadLocale(instruction[3])
+
+
+# move mouse pointer
+def executeMouseMove(instruction):
+    debug("{} (x={}, y={})", instruction[2], instruction[3], instruction[4])
+    mouse.move(x=instruction[3], y=instruction[4])
+
+
+# scroll mouse wheel
+def executeMouseWheel(instruction):
+    debug(instruction[2])
+    mouse.move(wheel=instruction[3])
+
+
+# click and release one or more mouse buttons
+def executeMouseClick(instruction):
+    debug("{} (buttons = {})", instruction[2], instruction[3])
+    mouse.click(instruction[3])
+
+
+# press (and don't release) one or more mouse buttons
+def executeMousePress(instruction):
+    debug("{} (buttons = {})", instruction[2], instruction[3])
+    mouse.press(instruction[3])
+
+
+# release one or more mouse buttons
+def executeMouseRelease(instruction):
+    debug("{} (buttons = {})", instruction[2], instruction[3])
+    mouse.release(instruction[3])
+
+
+# release all mouse buttons
+def executeMouseReleaseAll(instruction):
+    debug("MOUSE RELEASEALL")
+    mouse.release_all()
+
+
+# send cc action
+def executeConsumerControlSend(instruction):
+    debug("{} (code = {})", instruction[2], instruction[3])
+    cc.send(instruction[3])
+
+
+# press (and don't release) a cc action
+def executeConsumerControlPress(instruction):
+    debug("{} (code = {})", instruction[2], instruction[3])
+    cc.press(instruction[3])
+
+
+# release currently pressed cc (only one can be pressed at a time)
+def executeConsumerControlRelease(instruction):
+    debug("CC RELEASE")
+    cc.release()
+
+
+# control psychoMouse mode
+def executePsychoMouse(instruction):
+    global psychoMouse
+    psychoMouse = instruction[3]
+    if instruction[4] is not None:
+        config["psychoMouse"]["characters"] = instruction[4]
+    if instruction[5] is not None:
+        config["psychoMouse"]["range"] = instruction[5]
+
+
+def executeWaitForWifi(instruction):
+    yield from waitForWifiAPSteps(instruction[3])
+
+
+def executeWaitForLed(instruction):
+    info("Waiting for {} LED to be {}...", instruction[5], "on" if instruction[4] else "off")
+    syncSchedule()
+    while kbd.led_on(instruction[3]) != instruction[4]:
+        yield from delaySteps(100000000)
+
+
+# no recognized special command => just press the converted keycodes
+def executeKeys(instruction):
+    debug("{} (keycodes = {})", instruction[2], instruction[3])
+    performKeyboardAction(instruction[3], instruction[4])
+
+
+instructionHandlers = {
+    OP_NOOP: executeNoop,
+    OP_DELAY: executeDelay,
+    OP_STRING: executeString,
+    OP_PRINT: executePrint,
+    OP_DEFAULTDELAY: executeDefaultDelay,
+    OP_TYPINGINTERVAL: executeTypingInterval,
+    OP_CALIBRATE: executeCalibrate,
+    OP_HOSTPROFILE: executeHostProfile,
+    OP_LED: executeLed,
+    OP_BLINKLED: executeBlinkLed,
+    OP_IMPORT: executeImport,
+    OP_LOCALE: executeLocale,
+    OP_MOUSE_MOVE: executeMouseMove,
+    OP_MOUSE_WHEEL: executeMouseWheel,
+    OP_MOUSE_CLICK: executeMouseClick,
+    OP_MOUSE_PRESS: executeMousePress,
+    OP_MOUSE_RELEASE: executeMouseRelease,
+    OP_MOUSE_RELEASEALL: executeMouseReleaseAll,
+    OP_CC_SEND: executeConsumerControlSend,
+    OP_CC_PRESS: executeConsumerControlPress,
+    OP_CC_RELEASE: executeConsumerControlRelease,
+    OP_PSYCHOMOUSE: executePsychoMouse,
+    OP_WAITFORWIFI: executeWaitForWifi,
+    OP_WAITFORLED: executeWaitForLed,
+    OP_KEYS: executeKeys,
+}
+
+
+# instructions whose runtime is not absorbed by the following wait
+synchronizingOpcodes = {
+    OP_STRING,
+    OP_KEYS,
+    OP_IMPORT,
+    OP_MOUSE_MOVE,
+    OP_MOUSE_WHEEL,
+    OP_MOUSE_CLICK,
+    OP_MOUSE_PRESS,
+    OP_MOUSE_RELEASE,
+    OP_MOUSE_RELEASEALL,
+    OP_CC_SEND,
+    OP_CC_PRESS,
+    OP_CC_RELEASE,
+    OP_WAITFORWIFI,
+    OP_WAITFORLED,
+    OP_CALIBRATE,
+    OP_LOCALE,
+    OP_HOSTPROFILE,
+}
+
+
+# run a list of compiled duckyscript instructions (as steps)
+#  - yields 0 after every instruction (scripts can be interrupted there)
+#  - progress is only tracked for the initial program (not for imported ones)
+#  - locale: locale the program was compiled with, the rest of the program is compiled again if an IMPORT
+#    leaves another locale behind (LOCALE in the imported payload)
+def programSteps(program, trackProgress=True, locale=None):
+    if trackProgress:
+        execution["total"] = len(program)
+    compiledLocale = locale
+    lineLocales = {}
+    index = 0
+    while index < len(program):
+        instruction = program[index]
+        if trackProgress:
+            execution["done"] = index
+        if instruction[0] == OP_REPEAT:
+            # repeat the last command
+            for i in range(instruction[3]):
+                if instruction[4] >= 0:
+                    yield from instructionSteps(program[instruction[4]])
+                yield 0
+                yield from delaySteps(defaultDelay * 1000000)
+        else:
+            yield from instructionSteps(instruction)
+        yield 0
+        yield from delaySteps(defaultDelay * 1000000)
+
+        if instruction[0] == OP_LOCALE:
+            compiledLocale = instruction[3]
+        elif compiledLocale is not None and currentLocale != compiledLocale:
+            compiledLocale = lineLocales[instruction[1]] = currentLocale
+            program = recompileProgram(program, locale, lineLocales)
+        index += 1
+    if trackProgress:
+        execution["done"] = len(program)
+
+
+# store compiled payload as sidecar next to its source
+#  - only possible if the drive isn't mounted by the host (stealth mode)
+def cacheCompiledPayload(duckyScriptPath, locale, program):
+    if not config["compiledPayloadCache"]:
+        return False
+
+    if not openStorage():
+        return False
+    result = saveCompiled(duckyScriptPath, locale, program)
+    closeStorage()
+    return result
+
+
+# compiled program of a payload file (compiled sidecar if it's up to date)
+def loadPayloadProgram(duckyScriptPath, locale):
+    program = None
+    if config["compiledPayloadCache"]:
+        program = loadCompiled(duckyScriptPath, locale)
+    if program is None:
+        f = open(duckyScriptPath, "r", encoding="utf-8")
+        program = compileDuckyScript(f.readlines(), locale)[0]
+        f.close()
+    return program
 
 
 # process a duckyscript file or file content
+#  - scripts rejected before they run (import cycles) are only logged
 def processDuckyScript(duckyScriptPath, duckyScript=None, initialCall=True):
+    try:
+        runSteps(duckyScriptSteps(duckyScriptPath, duckyScript, initialCall))
+    except ImportCycleError as e:
+        error("Script rejected: {}", e)
+
+
+# process a duckyscript file, file content or compiled program (as steps)
+def duckyScriptSteps(duckyScriptPath, duckyScript=None, initialCall=True, program=None):
     global delayCounter
 
     if initialCall:
         delayCounter = 0
+        clearImportCache()
+        resetProfile()
+        resetTrace()
         if duckyScriptPath:
             displayTextLine(f"{duckyScriptPath.replace("fd/payloads/", "")}", clear=True)
-        elif duckyScript:
+        else:
             displayTextLine("<fileless payload>", clear=True)
         displayTextLine("... running ...", 2)
 
     if not initialCall:
-        myprint("")
+        info("")
 
     stopwatch = time.monotonic()
+    locale = currentLocale
     if duckyScriptPath:
-        myprint(f"Running {duckyScriptPath}")
-        myprint("--------------------------------")
-        f = open(duckyScriptPath, "r", encoding="utf-8")
-        duckyScript = f.readlines()
-        f.close()
+        info("Running {}", duckyScriptPath)
+        info("--------------------------------")
+        if not initialCall:
+            program = cachedImport(duckyScriptPath, locale)
+        if program is None and config["compiledPayloadCache"]:
+            program = loadCompiled(duckyScriptPath, locale)
+        if program is None:
+            f = open(duckyScriptPath, "r", encoding="utf-8")
+            duckyScript = f.readlines()
+            f.close()
 
-    elif duckyScript:
-        myprint(f"Running fileless duckyscript")
-        myprint("--------------------------------")
+    else:
+        info("Running fileless duckyscript")
+        info("--------------------------------")
         duckyScriptPath = "<fileless duckyscript>"
-        duckyScript = duckyScript.split("\n")
+        if program is None:
+            duckyScript = duckyScript.split("\n")
 
-    previousLine = ""
-    for line in duckyScript:
+    isCompiled = program is None
+    if isCompiled:
+        program = compileDuckyScript(duckyScript, locale)[0]
+
+    if initialCall:
+        # compile all imports up front (refuse to run scripts that would import themselves over and over)
+        try:
+            resolveImports(program, duckyScriptPath, locale, loadPayloadProgram)
+        except ImportCycleError:
+            displayTextLine("import cycle!", 2)
+            clearImportCache()
+            raise
+        # start the schedule once loading and compiling is done (or the first wait would absorb it)
+        resetSchedule()
+    else:
+        cacheImport(duckyScriptPath, locale, program)
 
-        # split line into tokens (0 = command, 1-x = parameters)
-        line = line.rstrip()
-        tokens = splitToTokens(line)
+    if tracing:
+        traceFile = enterTraceFile(duckyScriptPath)
+    yield from programSteps(program, initialCall, locale)
+    if tracing:
+        leaveTraceFile(traceFile)
 
-        if tokens[0] == "REPEAT":
-            # repeat the last command
-            for i in range(int(tokens[1])):
-                processLine(previousLine)
-                delay(float(defaultDelay) / 1000)
-        else:
-            processLine(line)
-            previousLine = line
-        delay(float(defaultDelay) / 1000)
+    # store compiled payload for the next run (once injection is done)
+    if initialCall and isCompiled and duckyScriptPath.endswith(".dd"):
+        cacheCompiledPayload(duckyScriptPath, locale, program)
 
-    myprint("--------------------------------")
+    info("--------------------------------")
 
     stopwatch = time.monotonic() - stopwatch
     if stopwatch > 1:
-        myprint(
-            f" -> Finished {duckyScriptPath}. Processed {len(duckyScript)} lines in {round(stopwatch, 2)} seconds."
+        info(
+            f" -> Finished {duckyScriptPath}. Processed {len(program)} lines in {round(stopwatch, 2)} seconds."
         )
     else:
-        myprint(
-            f" -> Finished {duckyScriptPath}. Processed {len(duckyScript)} lines in {round(1000 * stopwatch, 2)} milliseconds."
+        info(
+            f" -> Finished {duckyScriptPath}. Processed {len(program)} lines in {round(1000 * stopwatch, 2)} milliseconds."
         )
     if initialCall:
+        clearImportCache()
         displayTextLine(f"finished in {round(stopwatch, 2)}s", 2)
-        myprint(
+        info(
             f" -> All delays (commands and default delay) summed up to {delayCounter} seconds."
         )
-    myprint("")
+        info(
+            f" -> Actually waited {round(scheduleStatistics['actual'] / 1000000000, 3)} seconds"
+            f" ({scheduleStatistics['overruns']} of {scheduleStatistics['waits']} waits overrun by processing,"
+            f" max. {round(scheduleStatistics['maxLateness'] / 1000000, 2)} ms late)."
+        )
+    info("")
+
+
+# log the boot timeline and store it along with the ones of the last boots
+def finishBootTimeline():
+    printTimeline(info)
+    if not config["bootTimeline"]["enabled"]:
+        return
+    writable = openStorage()
+    saveTimeline(config["bootTimeline"]["nvmOffset"], writable)
+    if writable:
+        closeStorage()
 
 
 # -----------------------------------------------------------------------------------------------------
 # Web Server
 # -----------------------------------------------------------------------------------------------------
 
+# routes of the web server (path, method, handler)
+#  - only handed to ampule once the web server is started (see importWebserver)
+routes = []
+
+
+def route(path, method="GET"):
+    def register(handler):
+        routes.append((path, method, handler))
+        return handler
+
+    return register
+
+
+# import the script engine (only needed to run payloads at boot or through the web server, not by the mouse jiggler)
+#  - compiler, layouts, caches, scheduler, profiler and tracer
+#  - the opcodes are imported at boot, the instruction tables are built from them
+def importScriptEngine():
+    global scriptEngineImported
+    global compileDuckyScript, recompileProgram
+    global CountingDevice, pressAndRelease, reportCount, sendStrokes
+    global ImportCycleError, cacheImport, cachedImport, clearImportCache, resolveImports
+    global keyboardLedKeys, keyboardLeds, loadLayout
+    global cachePath, loadCompiled, saveCompiled
+    global profileSummary, recordInstruction, resetProfile
+    global SPIN_NS, beginWait, finishWait, remainingWait, resetSchedule, scheduleStatistics, syncSchedule
+    global enterTraceFile, exportBinary, exportJson, leaveTraceFile, recordTrace, resetTrace
+
+    if scriptEngineImported:
+        return
+
+    from fd.compiler import compileDuckyScript, recompileProgram
+    from fd.hidReports import CountingDevice, pressAndRelease, reportCount, sendStrokes
+    from fd.importCache import (
+        ImportCycleError,
+        cacheImport,
+        cachedImport,
+        clearImportCache,
+        configureImportCache,
+        resolveImports,
+    )
+    from fd.keyboardLeds import keyboardLedKeys, keyboardLeds
+    from fd.keyboardLocales import configureLayouts, loadLayout
+    from fd.payloadCache import cachePath, loadCompiled, saveCompiled
+    from fd.profiler import profileSummary, recordInstruction, resetProfile
+    from fd.scheduler import (
+        SPIN_NS,
+        beginWait,
+        finishWait,
+        remainingWait,
+        resetSchedule,
+        syncSchedule,
+    )
+    from fd.scheduler import statistics as scheduleStatistics
+    from fd.tracer import (
+        configureTracer,
+        enterTraceFile,
+        exportBinary,
+        exportJson,
+        leaveTraceFile,
+        recordTrace,
+        resetTrace,
+    )
 
-def encodeForTransport(s):
-    s = s.encode("utf-8")
-    s = binascii.b2a_base64(s)
-    return s
+    configureTracer(config["traceCapacity"])
+    configureLayouts(config["layoutCache"]["size"], config["layoutCache"]["minimumFree"])
+    configureImportCache(config["importCache"]["maximumInstructions"], config["importCache"]["minimumFree"])
+    scriptEngineImported = True
+
+
+# import the Wifi and web stack (only needed once the web server is started, not for injecting payloads at boot)
+def importWebserver():
+    global ampule, json, socketpool, wifi
+    global headersAuth, headersHtml, headersJson, headersText
+    global ListeningSocket, bodyLines, sendEvent, sendFile, startEventStream
+    global configureIndex, isIndexLoaded, listPayloads, refreshIndex, removePayload, saveIndex, updatePayload
+    global dryRun, sendAsset, unquote, unquoteBytes
+
+    importScriptEngine()
+
+    import ampule
+    import json
+    import socketpool
+    import wifi
+
+    from fd.estimator import dryRun
+    from fd.htmlHeaders import headersAuth, headersHtml, headersJson, headersText
+    from fd.httpStream import ListeningSocket, bodyLines, sendEvent, sendFile, startEventStream
+    from fd.payloadIndex import (
+        configureIndex,
+        isIndexLoaded,
+        listPayloads,
+        refreshIndex,
+        removePayload,
+        saveIndex,
+        updatePayload,
+    )
+    from fd.staticAssets import sendAsset
+    from fd.unquote import unquote, unquoteBytes
+
+    for path, method, handler in routes:
+        ampule.route(path, method=method)(handler)
+
+    configurePayloadIndex()
+
+
+# estimate payloads in the index with the current settings (host profiles and DEFAULTDELAY change them)
+#  - returns True if they changed
+def configurePayloadIndex():
+    return configureIndex(
+        config["locale"],
+        reportInterval,
+        defaultDelay,
+        config["hid"]["reportTime"] * 1000,
+        config["hid"]["singleReportCombos"],
+    )
+
+
+def isJobRunning():
+    return job is not None and job["state"] == "running"
+
+
+# response to run requests while a job is running
+def jobBusy():
+    result = {
+        "error": "busy",
+        "notification": "Another script is still running.",
+    }
+    return (409, headersJson, json.dumps(result))
+
+
+# run a fileless payload (script or compiled program) as background job (stepped by the webserver loop)
+#  - only one job at a time
+#  - returns job id or None if another job is still running
+def startJob(duckyScript=None, program=None):
+    global job, jobCounter
+    if isJobRunning():
+        return None
+
+    execution["line"] = execution["done"] = execution["total"] = 0
+    jobCounter += 1
+    job = {
+        "id": jobCounter,
+        "state": "running",
+        "steps": duckyScriptSteps(duckyScriptPath=None, duckyScript=duckyScript, program=program),
+        "started": time.monotonic(),
+        "finished": None,
+        "cancel": False,
+        "error": None,
+    }
+    return jobCounter
+
+
+# run the background job's next step
+#  - cancelled or failed jobs release all keys and buttons
+def stepJob():
+    try:
+        if job["cancel"]:
+            job["steps"].close()
+            info("Script cancelled in line {}", execution["line"])
+            releaseAll()
+            finishJob("cancelled")
+        else:
+            next(job["steps"])
+    except StopIteration:
+        finishJob("finished")
+    except Exception as e:
+        error("Script failed in line {}: {}", execution["line"], e)
+        releaseAll()
+        job["error"] = str(e)
+        finishJob("failed")
+
+
+def finishJob(state):
+    job["state"] = state
+    job["steps"] = None
+    job["finished"] = time.monotonic()
+
+
+def jobStatus():
+    elapsed = (job["finished"] or time.monotonic()) - job["started"]
+    status = {
+        "id": job["id"],
+        "state": job["state"],
+        "line": execution["line"],
+        "progress": round(100 * execution["done"] / execution["total"]) if execution["total"] else 0,
+        "elapsed": round(elapsed, 2),
+        "error": job["error"],
+    }
+    return status
+
+
+# push new log records to all output streams
+#  - streams are closed once the job is over
+def pumpOutputStreams():
+    finished = job["state"] != "running"
+    sequence = logSequence()
+    for stream in outputStreams[:]:
+        client = stream[0]
+        closing = finished
+        try:
+            if stream[1] != sequence:
+                for number, record in recordsSince(stream[1]):
+                    sendEvent(client, formatRecord(record), eventId=number)
+                stream[1] = sequence
+            if finished:
+                sendEvent(client, job["state"], event="end")
+        except OSError:
+            closing = True
+        if closing:
+            client.close()
+            outputStreams.remove(stream)
+
+
+# release all keys, mouse buttons and media keys
+#  - HID devices only exist once USB is connected
+def releaseAll():
+    if "kbd" in globals():
+        kbd.release_all()
+        mouse.release_all()
+        cc.release()
 
 
 def decodeFromTransport(s):
-    s = unquote(s)
+    s = unquoteBytes(s)
     s = binascii.a2b_base64(s)
     s = s.decode("utf-8")
     return s
@@ -596,35 +1047,87 @@ def getPostParams(request):
     return params
 
 
-def readFile(filename):
-    try:
-        f = open(filename, "r")
-        d = f.read()
-        f.close()
-        return d
-    except Exception:
-        print("Error trying to read file: ", filename)
-        return None
+# update a saved payload's index entry (filesystem has to be writable)
+def indexPayload(filename):
+    name = filename[len("fd/payloads/") :]
+    if name.endswith(".dd") and "/" not in name:
+        try:
+            updatePayload(name)
+        except (OSError, UnicodeError):
+            removePayload(name)
+        saveIndex()
+
+
+# settings of a dry run: the state the next run would start with
+def dryRunSettings():
+    global hostProfiles
+    if hostProfiles is None:
+        from fd.calibration import loadHostProfiles
+
+        hostProfiles = loadHostProfiles()
+    return {
+        "locale": currentLocale,
+        "reportInterval": reportInterval,
+        "defaultDelay": defaultDelay,
+        "reportTime": config["hid"]["reportTime"] * 1000,
+        "singleReportCombos": config["hid"]["singleReportCombos"],
+        "psychoMouse": psychoMouse,
+        "psychoMouseCharacters": config["psychoMouse"]["characters"],
+        "hostProfiles": hostProfiles,
+    }
 
 
-def writeFile(filename, content):
-    try:
-        f = open(filename, "w", encoding="utf-8")
-        for line in content:
-            f.write(line)
-        f.close()
-        return True
-    except Exception:
-        print("Error trying to write file: ", filename)
+# response to write requests while the USB drive is mounted on the host
+def storageLocked():
+    result = {
+        "result": "error",
+        "notification": "USB drive is mounted on the host. Configure FeatherS2 Ducky to boot into stealth-mode.",
+    }
+    return (200, headersJson, json.dumps(result))
+
+
+# payload file names sent by clients have to name a .dd file directly inside fd/payloads
+def isPayloadName(name):
+    if len(name) <= len(".dd") or not name.endswith(".dd"):
         return False
+    return "/" not in name and "\\" not in name and ".." not in name
 
 
-def htmlHeader():
-    return readFile("fd/web/header.html")
+# response to requests with a file name that isn't a payload (see isPayloadName)
+def invalidPayloadName():
+    result = {
+        "result": "error",
+        "notification": "Invalid payload file name.",
+    }
+    return (400, headersJson, json.dumps(result))
+
+
+# respond with a file (streamed from flash as it is, bypassing ampule)
+#  - responses of detached clients are discarded, they get fresh headers (ampule may add to them,
+#    the shared header constants must stay untouched)
+def serveFile(path, headers):
+    try:
+        os.stat(path)
+    except OSError:
+        return (404, headersJson, json.dumps({"error": "file not found"}))
+
+    client = listeningSocket.detachClient()
+    try:
+        sendFile(client, 200, headers, path)
+    finally:
+        client.close()
+    return (200, {}, "")
 
 
-def htmlFooter():
-    return readFile("fd/web/footer.html")
+# respond with a static web UI asset
+#  - the response is sent directly (assets are bytes, ampule only sends text), ampule's response is discarded
+def serveAsset(request, name):
+    client = listeningSocket.detachClient()
+    try:
+        sendAsset(client, name, request.headers)
+    finally:
+        client.close()
+    return (200, {}, "")
 
 
 def checkAuthorization(request):
@@ -646,42 +1149,37 @@ def checkAuthorization(request):
     return (401, headersAuth, "")
 
 
-@ampule.route("/")
+@route("/")
 def light_set(request):
     debugRequest(request)
 
     if requiresAuthorization := checkAuthorization(request):
         return requiresAuthorization
 
-    html = htmlHeader()
-    html += readFile("fd/web/content.html")
-    html += htmlFooter()
-    return (200, headersHtml, html)
+    return serveAsset(request, "index")
 
 
-@ampule.route("/script.js")
+@route("/script.js")
 def light_set(request):
     debugRequest(request)
 
     if requiresAuthorization := checkAuthorization(request):
         return requiresAuthorization
 
-    content = readFile("fd/web/script.js")
-    return (200, headersJs, content)
+    return serveAsset(request, "script.js")
 
 
-@ampule.route("/style.css")
+@route("/style.css")
 def light_set(request):
     debugRequest(request)
 
     if requiresAuthorization := checkAuthorization(request):
         return requiresAuthorization
 
-    content = readFile("fd/web/style.css")
-    return (200, headersCss, content)
+    return serveAsset(request, "style.css")
 
 
-@ampule.route("/api/statistics")
+@route("/api/statistics")
 def light_set(request):
     debugRequest(request)
 
@@ -738,26 +1236,62 @@ def light_set(request):
                 "used": round(100 * mem_used / mem_total, 2),
             },
         },
-        "usb_connected": supervisor.runtime.usb_connected
+        "usb_connected": supervisor.runtime.usb_connected,
+        "boot": {
+            "unit_of_measurement": "ms",
+            "current": bootTimeline(),
+            "history": timelineHistory(config["bootTimeline"]["nvmOffset"]),
+        },
     }
 
     return (200, headersJson, json.dumps(result))
 
 
-@ampule.route("/api/fetchPayloads")
+@route("/api/profile")
+def light_set(request):
+    debugRequest(request)
+
+    if requiresAuthorization := checkAuthorization(request):
+        return requiresAuthorization
+
+    result = profileSummary()
+    result["enabled"] = profiling
+    return (200, headersJson, json.dumps(result))
+
+
+@route("/api/trace")
 def light_set(request):
     debugRequest(request)
 
     if requiresAuthorization := checkAuthorization(request):
         return requiresAuthorization
 
-    payloads = []
-    files = os.listdir("fd/payloads")
-    payloads = [f for f in files if f.endswith(".dd")]
-    return (200, headersJson, json.dumps(payloads))
+    # binary traces are transported base64 encoded
+    if request.params.get("format", "json") == "binary":
+        trace = binascii.b2a_base64(exportBinary()).decode().strip()
+        return (200, headersJson, json.dumps({"format": "binary", "trace": trace}))
 
+    return (200, headersJson, json.dumps(exportJson()))
 
-@ampule.route("/api/loadPayload")
+
+@route("/api/fetchPayloads")
+def light_set(request):
+    debugRequest(request)
+
+    if requiresAuthorization := checkAuthorization(request):
+        return requiresAuthorization
+
+    # revalidate against flash on first use, on request (e.g. files changed while mounted on the host)
+    # or once the estimate settings changed
+    if configurePayloadIndex() or not isIndexLoaded() or request.params.get("refresh", None):
+        if refreshIndex() and openStorage():
+            saveIndex()
+            closeStorage()
+
+    return (200, headersJson, json.dumps(listPayloads()))
+
+
+@route("/api/loadPayload")
 def light_set(request):
     debugRequest(request)
 
@@ -765,18 +1299,15 @@ def light_set(request):
         return requiresAuthorization
 
     if "file" in request.params.keys():
-        file = request.params["file"]
-        payload = readFile(f"fd/payloads/{file}")
-        if payload:
-            return (200, headersJson, json.dumps({"payload": encodeForTransport(payload)}))
+        if not isPayloadName(request.params["file"]):
+            return invalidPayloadName()
+        return serveFile(f"fd/payloads/{request.params['file']}", headersText)
 
     return (404, headersJson, json.dumps({"error": "file not found"}))
 
 
-@ampule.route("/api/runPayload", method="POST")
+@route("/api/runPayload", method="POST")
 def light_set(request):
-    global duckyScriptResult
-
     debugRequest(request)
 
     if requiresAuthorization := checkAuthorization(request):
@@ -784,78 +1315,343 @@ def light_set(request):
 
     params_post = getPostParams(request)
 
-    duckyScriptResult = ""
-    processDuckyScript(
-        duckyScriptPath=None, duckyScript=decodeFromTransport(params_post["payload"])
-    )
+    if isJobRunning():
+        return jobBusy()
+
+    clearLog()
+    jobId = startJob(decodeFromTransport(params_post["payload"]))
+
+    result = {
+        "job": jobId,
+        "notification": "Script started.",
+    }
+    return (200, headersJson, json.dumps(result))
+
+
+# run a payload sent as raw request body (application/octet-stream)
+#  - the script is compiled line by line while it's received
+@route("/api/runUpload", method="POST")
+def light_set(request):
+    debugRequest(request)
+
+    if requiresAuthorization := checkAuthorization(request):
+        return requiresAuthorization
+
+    if isJobRunning():
+        return jobBusy()
+
+    clearLog()
+    length = int(request.headers.get("content-length", 0))
+    try:
+        program = compileDuckyScript(bodyLines(listeningSocket.requestBody(length)), currentLocale)[0]
+    except (OSError, UnicodeError):
+        result = {
+            "error": "upload",
+            "notification": "Error receiving script.",
+        }
+        return (400, headersJson, json.dumps(result))
 
     result = {
-        "result": encodeForTransport(duckyScriptResult),
-        "notification": "Script ran successfully. See script output below.",
+        "job": startJob(program=program),
+        "notification": "Script started.",
     }
     return (200, headersJson, json.dumps(result))
 
 
-@ampule.route("/api/savePayload", method="POST")
+# estimate the runtime of a script sent as raw request body without running it (no HID reports are sent)
+#  - IMPORTs are followed, names the compiler couldn't resolve are listed
+@route("/api/dryRun", method="POST")
+def light_set(request):
+    debugRequest(request)
+
+    if requiresAuthorization := checkAuthorization(request):
+        return requiresAuthorization
+
+    length = int(request.headers.get("content-length", 0))
+    try:
+        result = dryRun(bodyLines(listeningSocket.requestBody(length)), dryRunSettings())
+    except (OSError, UnicodeError):
+        result = {
+            "error": "upload",
+            "notification": "Error receiving script.",
+        }
+        return (400, headersJson, json.dumps(result))
+
+    return (200, headersJson, json.dumps(result))
+
+
+# dry run of a stored payload (see /api/dryRun)
+@route("/api/dryRunPayload")
 def light_set(request):
+    debugRequest(request)
+
+    if requiresAuthorization := checkAuthorization(request):
+        return requiresAuthorization
+
+    if not isPayloadName(request.params.get("file", "")):
+        return invalidPayloadName()
+
+    path = f"fd/payloads/{request.params['file']}"
+    try:
+        f = open(path, "r", encoding="utf-8")
+        result = dryRun(f, dryRunSettings(), path)
+        f.close()
+    except (OSError, UnicodeError):
+        return (404, headersJson, json.dumps({"error": "file not found"}))
+
+    return (200, headersJson, json.dumps(result))
+
+
+@route("/api/jobStatus")
+def light_set(request):
+    debugRequest(request)
+
+    if requiresAuthorization := checkAuthorization(request):
+        return requiresAuthorization
+
+    if job is None or str(job["id"]) != request.params.get("id", ""):
+        return (404, headersJson, json.dumps({"error": "job not found"}))
+
+    return (200, headersJson, json.dumps(jobStatus()))
+
 
+# stream the job's script output (Server-Sent Events, one event per log record)
+#  - reconnecting clients continue after the last record they received
+@route("/api/jobOutput")
+def light_set(request):
+    debugRequest(request)
+
+    if requiresAuthorization := checkAuthorization(request):
+        return requiresAuthorization
+
+    if job is None or str(job["id"]) != request.params.get("id", ""):
+        return (404, headersJson, json.dumps({"error": "job not found"}))
+
+    client = listeningSocket.detachClient()
+    startEventStream(client)
+    outputStreams.append([client, int(request.headers.get("last-event-id", 0))])
+    return (200, {}, "")
+
+
+@route("/api/cancelJob", method="POST")
+def light_set(request):
     debugRequest(request)
 
     if requiresAuthorization := checkAuthorization(request):
         return requiresAuthorization
 
     params_post = getPostParams(request)
+    if job is None or str(job["id"]) != params_post.get("id", ""):
+        return (404, headersJson, json.dumps({"error": "job not found"}))
 
-    filename = f"fd/payloads/{decodeFromTransport(params_post["filename"])}"
+    # stopped by the webserver loop before the job's next step
+    if job["state"] == "running":
+        job["cancel"] = True
+    return (200, headersJson, json.dumps(jobStatus()))
+
+
+@route("/api/savePayload", method="POST")
+def light_set(request):
+
+    debugRequest(request)
+
+    if requiresAuthorization := checkAuthorization(request):
+        return requiresAuthorization
+
+    params_post = getPostParams(request)
+
+    name = decodeFromTransport(params_post.get("filename", ""))
+    if not isPayloadName(name):
+        return invalidPayloadName()
+
+    filename = f"fd/payloads/{name}"
     content = decodeFromTransport(params_post["payload"])
 
-    try:
-        # remount with write permissions
-        storage.remount("/", readonly=False)
-    except Exception:
+    if not openStorage():
+        return storageLocked()
+
+    # write payload to file (and its compiled sidecar)
+    if writePayload(filename, content):
+        program = compileDuckyScript(content.split("\n"), config["locale"])[0]
+        cacheCompiledPayload(filename, config["locale"], program)
+        indexPayload(filename)
+        result = {
+            "result": "success",
+            "notification": "Successfully written file.",
+        }
+    else:
         result = {
             "result": "error",
-            "notification": "USB drive is mounted on the host. Configure FeatherS2 Ducky to boot into stealth-mode.",
+            "notification": "Error writing file.",
         }
-        return (200, headersJson, json.dumps(result))
 
-    # write payload to file
-    if writeFile(filename, content):
+    closeStorage()
+
+    return (200, headersJson, json.dumps(result))
+
+
+# store a payload sent as raw request body (application/octet-stream, file name as query parameter)
+#  - the body is written to flash block by block while it's received
+#  - the previous version of the file is kept if the upload doesn't complete
+@route("/api/uploadPayload", method="POST")
+def light_set(request):
+    debugRequest(request)
+
+    if requiresAuthorization := checkAuthorization(request):
+        return requiresAuthorization
+
+    name = unquote(request.params.get("file", ""))
+    if not isPayloadName(name):
+        return invalidPayloadName()
+
+    filename = f"fd/payloads/{name}"
+    length = int(request.headers.get("content-length", 0))
+
+    if not openStorage():
+        return storageLocked()
+
+    # write payload to file (and its compiled sidecar)
+    writer = None
+    try:
+        writer = PayloadWriter(filename)
+        for chunk in listeningSocket.requestBody(length):
+            writer.write(chunk)
+        writer.commit()
+
+        f = open(filename, "r", encoding="utf-8")
+        program = compileDuckyScript(f, config["locale"])[0]
+        f.close()
+        cacheCompiledPayload(filename, config["locale"], program)
+        indexPayload(filename)
         result = {
             "result": "success",
             "notification": "Successfully written file.",
         }
-    else:
+    except OSError:
+        if writer is not None:
+            writer.abort()
         result = {
             "result": "error",
             "notification": "Error writing file.",
         }
 
-    # remount with read-only permissions
-    storage.remount("/", readonly=True)
+    closeStorage()
 
     return (200, headersJson, json.dumps(result))
 
 
-@ampule.route("/api/deletePayload", method="POST")
+# keep the filesystem writable while several payloads are uploaded (instead of remounting for each of them)
+#  - ended by /api/endUploadSession
+@route("/api/beginUploadSession", method="POST")
 def light_set(request):
-    return (200, headersJson, "")
+    global uploadSession
+    debugRequest(request)
+
+    if requiresAuthorization := checkAuthorization(request):
+        return requiresAuthorization
+
+    if not uploadSession:
+        if not openStorage():
+            return storageLocked()
+        uploadSession = True
+
+    return (200, headersJson, json.dumps({"result": "success"}))
 
 
-@ampule.route("/api/checkUsbHid")
+@route("/api/endUploadSession", method="POST")
 def light_set(request):
+    global uploadSession
+    debugRequest(request)
+
+    if requiresAuthorization := checkAuthorization(request):
+        return requiresAuthorization
+
+    if uploadSession:
+        closeStorage()
+        uploadSession = False
+
+    return (200, headersJson, json.dumps({"result": "success"}))
+
+
+# delete a payload (file name as query parameter) along with its compiled sidecar
+@route("/api/deletePayload", method="POST")
+def light_set(request):
+    debugRequest(request)
+
+    if requiresAuthorization := checkAuthorization(request):
+        return requiresAuthorization
+
+    name = unquote(request.params.get("file", ""))
+    if not isPayloadName(name):
+        return invalidPayloadName()
+
+    filename = f"fd/payloads/{name}"
+
+    if not openStorage():
+        return storageLocked()
+
+    try:
+        os.remove(filename)
+        try:
+            os.remove(cachePath(filename))
+        except OSError:
+            pass
+        removePayload(name)
+        saveIndex()
+        result = {
+            "result": "success",
+            "notification": "Successfully deleted file.",
+        }
+    except OSError:
+        result = {
+            "result": "error",
+            "notification": "Error deleting file.",
+        }
+
+    closeStorage()
+
+    return (200, headersJson, json.dumps(result))
+
+
+@route("/api/checkUsbHid")
+def light_set(request):
+    global kbd, keyboardDevice, mouse, cc
 
     if supervisor.runtime.usb_connected:
         kbd = Keyboard(usb_hid.devices)
+        keyboardDevice = find_device(usb_hid.devices, usage_page=0x1, usage=0x06)
         mouse = Mouse(usb_hid.devices)
         cc = ConsumerControl(usb_hid.devices)
-        loadLocale(config["locale"])
+        if tracing:
+            countHidReports()
+        # a running script keeps the locale it switched to (LOCALE)
+        if not isJobRunning():
+            loadLocale(config["locale"])
 
     return (200, headersJson, json.dumps({ "result": supervisor.runtime.usb_connected }))
 
 
+# count HID reports sent by keyboard, mouse and consumer control (for execution traces)
+#  - onReport: called once a report was sent
+def countHidReports(onReport=None):
+    global keyboardDevice
+    keyboardDevice = kbd._keyboard_device = CountingDevice(keyboardDevice, onReport)
+    mouse._mouse_device = CountingDevice(mouse._mouse_device, onReport)
+    cc._consumer_device = CountingDevice(cc._consumer_device, onReport)
+
+
+# mark the first HID report sent by the payload run at boot (boot timeline)
+def markFirstReport():
+    global awaitingFirstReport
+    if awaitingFirstReport:
+        markPhase("first report")
+        awaitingFirstReport = False
+
+
 # spawn or connect to Wifi Access Point
 def runWebserver():
+    importWebserver()
+    markPhase("web imports")
     print("")
 
     if config["webserver"]["hostname"]:
@@ -950,10 +1746,12 @@ def runWebserver():
         print("Serving via HTTP at:")
         print(f" - http://{wifi.radio.hostname}:{config['webserver']['port']}")
         print(f" - http://{ipAddress}:{config['webserver']['port']}")
+    global listeningSocket
     pool = socketpool.SocketPool(wifi.radio)
     socket = pool.socket()
     socket.bind(["0.0.0.0", config["webserver"]["port"]])
     socket.listen(1)
+    listeningSocket = ListeningSocket(socket, ("/api/runUpload", "/api/uploadPayload", "/api/dryRun"))
 
     if config["webserver"]["credentials"] is None:
         print(" - no credentials required")
@@ -961,9 +1759,24 @@ def runWebserver():
         print(f" - Username: {config['webserver']['credentials']['username']}")
         print(f" - Password: {config['webserver']['credentials']['password']}")
 
+    markPhase("web server")
+    finishBootTimeline()
+
     # webserver listen loop
+    #  - while a job is running, requests are handled in between its steps (without blocking)
     while True:
-        ampule.listen(socket)
+        if isJobRunning():
+            listeningSocket.settimeout(0)
+            try:
+                ampule.listen(listeningSocket)
+            except OSError:
+                pass
+            stepJob()
+        else:
+            listeningSocket.settimeout(None)
+            ampule.listen(listeningSocket)
+        if outputStreams:
+            pumpOutputStreams()
 
 
 # -----------------------------------------------------------------------------------------------------
@@ -980,12 +1793,20 @@ def importDisplay():
         return _func
 
 
+# set up script output log
+configureLogger(
+    config["logging"]["level"],
+    config["logging"]["capacity"],
+    config["logging"]["serial"],
+)
+
 # disable CircuitPython auto-restart feature
 if not config["usbConnection"]["autoRestartOnTouch"]:
     supervisor.disable_autoreload()
 
 # dynamically import display lib (if enabled)
 displayTextLine = importDisplay()
+markPhase("display")
 
 # set up LED
 displayTextLine("Setting up LED...", clear=True)
@@ -994,20 +1815,40 @@ led.direction = Direction.OUTPUT
 
 # default settings
 defaultDelay = config["defaultDelay"]
+reportInterval = config["hid"]["reportInterval"] * 1000
+hostProfiles = None
 psychoMouse = False
+currentLocale = config["locale"]
 delayCounter = 0
-duckyScriptResult = ""
+# progress of the running script (current line, instructions done / total)
+execution = {"line": 0, "done": 0, "total": 0}
+# background job (web UI)
+job = None
+jobCounter = 0
+outputStreams = []
+uploadSession = False
+listeningSocket = None
+# mark the first HID report of the payload run at boot (boot timeline)
+awaitingFirstReport = False
+profiling = config["profiling"]
+tracing = config["traceCapacity"] > 0
+instrumented = profiling or tracing
+scriptEngineImported = False
 
 # wait for USB mount
 displayTextLine("Waiting for USB...")
-usbWaitCounter = 1
-while (not supervisor.runtime.usb_connected) and (usbWaitCounter <= config["usbConnection"]["waitCycles"]):
-    displayTextLine(f" --> {usbWaitCounter} / {config["usbConnection"]["waitCycles"]}", 2)
-    time.sleep(config["usbConnection"]["waitDelay"] / 1000)
-    usbWaitCounter += 1
+usbWaitDelay = config["usbConnection"]["waitDelay"]
+usbWaitCycles = config["usbConnection"]["waitCycles"]
+usbConnected = waitForUsbConnection(
+    usbWaitCycles * usbWaitDelay,
+    config["usbConnection"]["pollInterval"],
+    lambda elapsed: displayTextLine(f" --> {elapsed // usbWaitDelay + 1} / {usbWaitCycles}", 2),
+    usbWaitDelay,
+)
+markPhase("usb")
 
 # no USB HID device for quite some time => start the webserver (if enabled)
-if usbWaitCounter >= config["usbConnection"]["waitCycles"]:
+if usbConnected is None:
     displayTextLine(" -> timed out!", 2)
     time.sleep(2)
     displayTextLine("", 2, clear=True)
@@ -1016,35 +1857,64 @@ if usbWaitCounter >= config["usbConnection"]["waitCycles"]:
     displayTextLine("Starting Webserver...")
     if config["wifi"]["mode"] != "off":
         runWebserver()
+    else:
+        finishBootTimeline()
 
 # normal mode
 else:
+    info("USB connected after {} ms", usbConnected)
+
+    # wait for the host computer to pick up the keyboard (its first LED report), at most initialSleep
+    displayTextLine("Waiting for host...")
+    keyboardDevice = find_device(usb_hid.devices, usage_page=0x1, usage=0x06)
+    hostReport = None
+    if config["usbConnection"]["detectHost"]:
+        waited, hostReport = waitForHostReport(
+            keyboardDevice, config["initialSleep"], config["usbConnection"]["pollInterval"]
+        )
+        if hostReport is not None:
+            info("Host ready after {} ms", waited)
+        else:
+            info("No LED report from host, continuing after {} ms", waited)
+    else:
+        time.sleep(config["initialSleep"] / 1000)
+    markPhase("host")
 
     # set up keyboard + mouse
     displayTextLine("Setting up HID...")
     kbd = Keyboard(usb_hid.devices)
+    seedLedStatus(kbd, hostReport)
     mouse = Mouse(usb_hid.devices)
     cc = ConsumerControl(usb_hid.devices)
-    loadLocale(config["locale"])
-
-    # sleep at the start to allow the device to be recognized by the host computer
-    time.sleep(config["initialSleep"] / 1000)
+    markPhase("hid")
 
     # check IO11/IO12/IO13/IO14/IO15/IO16/IO17 for run mode
     displayTextLine("Checking PINs...")
-    if isPinGrounded(IO11):
-        processDuckyScript(config["payloads"]["IO11"])
-    elif isPinGrounded(IO12):
-        processDuckyScript(config["payloads"]["IO12"])
-    elif isPinGrounded(IO13):
-        processDuckyScript(config["payloads"]["IO13"])
-    elif isPinGrounded(IO14):
-        processDuckyScript(config["payloads"]["IO14"])
-    elif isPinGrounded(IO15):
-        processDuckyScript(config["payloads"]["IO15"])
-    elif isPinGrounded(IO16):
-        processDuckyScript(config["payloads"]["IO16"])
-    elif isPinGrounded(IO17):
+    autorunPayload = None
+    for pinName, pin in (("IO11", IO11), ("IO12", IO12), ("IO13", IO13), ("IO14", IO14), ("IO15", IO15), ("IO16", IO16)):
+        if isPinGrounded(pin):
+            autorunPayload = config["payloads"][pinName]
+            break
+    mouseJiggler = autorunPayload is None and isPinGrounded(IO17)
+    markPhase("pins")
+
+    # the mouse jiggler neither runs scripts nor the web server
+    if not mouseJiggler:
+        importScriptEngine()
+        if tracing or autorunPayload is not None:
+            countHidReports(markFirstReport)
+        loadLocale(config["locale"])
+        if config["hid"]["hostProfile"]:
+            applyHostProfile(config["hid"]["hostProfile"])
+        markPhase("locale")
+
+    if autorunPayload is not None:
+        awaitingFirstReport = True
+        processDuckyScript(autorunPayload)
+        awaitingFirstReport = False
+        markPhase("payload")
+    elif mouseJiggler:
+        finishBootTimeline()
         mouseJigglerLoop()
     else:
         print(
@@ -1055,3 +1925,5 @@ else:
     displayTextLine("Starting Webserver...")
     if config["wifi"]["mode"] != "off":
         runWebserver()
+    else:
+        finishBootTimeline()
@@ -0,0 +1,9 @@
+import os
+import sys
+
+# tests run on the host: fd is imported from the repository root (just like tools/dryRunPayload.py does)
+#  - stubs: the constants and US layout of adafruit_hid (used if it isn't installed on the host), storage
+#    and keyboard layouts only used by tests (locale XX)
+TESTS = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(TESTS, ".."))
+sys.path.append(os.path.join(TESTS, "stubs"))
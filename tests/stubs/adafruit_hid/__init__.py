@@ -0,0 +1,2 @@
+# constants of adafruit_hid used by fd (host tests without adafruit_hid installed)
+#  - only tables and constants, nothing sends HID reports
@@ -0,0 +1,8 @@
+# keyboard LED bits (constants of adafruit_hid.keyboard)
+
+
+class Keyboard:
+    LED_NUM_LOCK = 0x01
+    LED_CAPS_LOCK = 0x02
+    LED_SCROLL_LOCK = 0x04
+    LED_COMPOSE = 0x08
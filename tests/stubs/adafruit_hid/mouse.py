@@ -0,0 +1,9 @@
+# mouse buttons (constants of adafruit_hid.mouse)
+
+
+class Mouse:
+    LEFT_BUTTON = 1
+    RIGHT_BUTTON = 2
+    MIDDLE_BUTTON = 4
+    BACK_BUTTON = 8
+    FORWARD_BUTTON = 16
@@ -0,0 +1,11 @@
+from adafruit_hid.keyboard_layout_us import KeyboardLayoutUS
+
+# keyboard layout of the test locale XX: US with Y and Z swapped and ä on the apostrophe key (like German layouts)
+asciiToKeycode = bytearray(KeyboardLayoutUS.ASCII_TO_KEYCODE)
+for a, b in (("y", "z"), ("Y", "Z")):
+    asciiToKeycode[ord(a)], asciiToKeycode[ord(b)] = asciiToKeycode[ord(b)], asciiToKeycode[ord(a)]
+
+
+class KeyboardLayout(KeyboardLayoutUS):
+    ASCII_TO_KEYCODE = bytes(asciiToKeycode)
+    HIGHER_ASCII = {0xE4: 0x34}
@@ -0,0 +1,7 @@
+from adafruit_hid.keycode import Keycode as KeycodeUS
+
+
+# keycodes of the test locale XX: US with Y and Z swapped (like German layouts)
+class Keycode(KeycodeUS):
+    Y = KeycodeUS.Z
+    Z = KeycodeUS.Y
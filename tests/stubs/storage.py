@@ -0,0 +1,3 @@
+# CircuitPython's storage module (the host's filesystem is always writable)
+def remount(mount_path, readonly=False, disable_concurrent_write_protection=False):
+    pass
@@ -0,0 +1,85 @@
+from fd import hidReports
+from fd.calibration import calibrate
+
+CAPS_LOCK = 0x39
+LED_CAPS_LOCK = 0x02
+INTERVALS = [8000000, 4000000, 2000000, 1000000, 500000, 250000, 0]
+
+
+# time.monotonic_ns stand-in advancing by 1 us every time it's read
+class FakeClock:
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        self.now += 1000
+        return self.now
+
+
+# host toggling caps lock on every key press it accepts and echoing the LED state after a latency
+#  - presses arriving less than minimumSpacing after the last accepted one are dropped
+class FakeHost:
+    def __init__(self, clock, minimumSpacing, echoLatency):
+        self.clock = clock
+        self.minimumSpacing = minimumSpacing
+        self.echoLatency = echoLatency
+        self.lastPress = None
+        self.state = False
+        self.echoes = []
+        self.pressed = False
+        self.dropped = 0
+
+    # keyboard device
+    def send_report(self, report, report_id=None):
+        pressed = report[2] == CAPS_LOCK
+        if pressed and not self.pressed:
+            now = self.clock.now
+            if self.lastPress is not None and now - self.lastPress < self.minimumSpacing:
+                self.dropped += 1
+            else:
+                self.lastPress = now
+                self.state = not self.state
+                self.echoes.append((now + self.echoLatency, self.state))
+        self.pressed = pressed
+
+    # keyboard.led_on
+    def ledOn(self, ledCode):
+        now = self.clock()
+        state = False
+        for at, echoed in self.echoes:
+            if at > now:
+                break
+            state = echoed
+        return state
+
+
+def calibrateHost(monkeypatch, minimumSpacing, echoLatency):
+    clock = FakeClock()
+    monkeypatch.setattr(hidReports.time, "monotonic_ns", clock)
+    monkeypatch.setattr(hidReports, "lastReportTime", 0)
+    host = FakeHost(clock, minimumSpacing, echoLatency)
+    result = calibrate(host, host.ledOn, CAPS_LOCK, LED_CAPS_LOCK, INTERVALS, safetyFactor=1)
+    return host, result
+
+
+def test_calibrate_fast_host(monkeypatch):
+    host, result = calibrateHost(monkeypatch, 0, 3000000)
+    assert result["reportInterval"] == 0
+    assert host.dropped == 0
+    assert host.ledOn(LED_CAPS_LOCK) is False
+
+
+def test_calibrate_stops_at_first_interval_dropping_keystrokes(monkeypatch):
+    # presses are sent two report intervals apart: 500 us is the fastest interval the host keeps up with
+    host, result = calibrateHost(monkeypatch, 1000000, 3000000)
+    assert result["reportInterval"] == 500
+    assert host.dropped > 0
+    assert host.ledOn(LED_CAPS_LOCK) is False
+
+
+def test_calibrate_host_without_echo(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(hidReports.time, "monotonic_ns", clock)
+    monkeypatch.setattr(hidReports, "lastReportTime", 0)
+    host = FakeHost(clock, 0, 0)
+    assert calibrate(host, lambda ledCode: False, CAPS_LOCK, LED_CAPS_LOCK, INTERVALS, timeout=10000000) is None
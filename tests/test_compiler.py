@@ -0,0 +1,37 @@
+from fd.compiler import OP_STRING, compileDuckyScript, recompileProgram
+from fd.estimator import dryRun
+
+
+def strokes(program, lineNumber):
+    instruction = program[lineNumber - 1]
+    assert instruction[0] == OP_STRING
+    return instruction[4]
+
+
+def test_locale_applies_to_following_lines():
+    program = compileDuckyScript(["STRING z", "LOCALE XX", "STRING z"], "US")[0]
+    assert strokes(program, 1) != strokes(program, 3)
+    assert strokes(program, 3) == strokes(program, 1)[:1] + bytes([0x1C])
+
+
+def test_recompile_with_locale_left_behind_by_import():
+    # LOCALE XX in the imported payload applies to the rest of the importing one
+    program = compileDuckyScript(["STRING z", "IMPORT xx.dd", "STRING z"], "US")[0]
+    assert strokes(program, 3) == strokes(program, 1)
+
+    recompiled = recompileProgram(program, "US", {2: "XX"})
+    assert len(recompiled) == len(program)
+    assert strokes(recompiled, 1) == strokes(program, 1)
+    assert strokes(recompiled, 3) == strokes(compileDuckyScript(["STRING z"], "XX")[0], 1)
+
+
+def test_dryRun_follows_locale_of_import(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    f = open("xx.dd", "w", encoding="utf-8")
+    f.write("LOCALE XX\n")
+    f.close()
+
+    # US can't type ä, XX can: the estimate has to use the STRING compiled again after the import
+    result = dryRun(["IMPORT xx.dd", "STRING \u00e4"], {"locale": "US"})
+    assert result["imports"] == ["xx.dd"]
+    assert result["reports"] == 2
@@ -0,0 +1,59 @@
+import os
+
+import pytest
+
+from fd.compiler import compileDuckyScript
+from fd.estimator import dryRun, estimateProgram
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+PAYLOADS = sorted(f for f in os.listdir(os.path.join(ROOT, "fd", "payloads")) if f.endswith(".dd"))
+
+
+def compileLines(lines):
+    return compileDuckyScript(lines, "US")[0]
+
+
+def dryRunFile(path):
+    f = open(path, "r", encoding="utf-8")
+    result = dryRun(f, {"locale": "US"}, path)
+    f.close()
+    return result
+
+
+def test_estimateProgram_delays():
+    program = compileLines(["DELAY 3000", "DELAY 250"])
+    assert estimateProgram(program) == 3250000000
+
+
+def test_estimateProgram_default_delay_after_every_line():
+    program = compileLines(["DELAY 100", "DELAY 100"])
+    assert estimateProgram(program, defaultDelay=50) == 300000000
+
+
+def test_estimateProgram_typing_at_report_interval():
+    # press and release report per character
+    program = compileLines(["STRING abc"])
+    assert estimateProgram(program, reportInterval=1000000, reportTime=0) == 6000000
+
+
+@pytest.mark.parametrize("name", PAYLOADS)
+def test_dryRun_bundled_payload(monkeypatch, name):
+    # IMPORT paths are relative to the repository root
+    monkeypatch.chdir(ROOT)
+    path = f"fd/payloads/{name}"
+    result = dryRunFile(path)
+
+    assert result["payload"] == path
+    assert result["unresolved"] == []
+    assert result["instructions"] > 0
+    assert result["estimate"] >= result["delays"] + result["input"]
+    assert result["unit_of_measurement"] == "ms"
+
+
+def test_dryRun_follows_imports(monkeypatch):
+    monkeypatch.chdir(ROOT)
+    imported = dryRunFile("fd/payloads/open_notepad.dd")
+    result = dryRun(["DELAY 1000", "IMPORT fd/payloads/open_notepad.dd"], {})
+
+    assert result["imports"] == ["fd/payloads/open_notepad.dd"]
+    assert result["delays"] == 1000 + imported["delays"]
@@ -0,0 +1,74 @@
+from fd import hidReports
+from fd.hidReports import EMPTY_KEYBOARD_REPORT, CountingDevice, pressAndRelease, sendStrokes
+
+
+# time.monotonic_ns stand-in advancing by 1 us every time it's read
+class FakeClock:
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        self.now += 1000
+        return self.now
+
+
+# usb_hid.Device stand-in capturing every report sent (reports are copied, senders reuse their buffers)
+class FakeDevice:
+    def __init__(self, clock=None):
+        self.clock = clock
+        self.reports = []
+        self.times = []
+
+    def send_report(self, report, report_id=None):
+        self.reports.append(bytes(report))
+        if self.clock is not None:
+            self.times.append(self.clock.now)
+
+
+def test_pressAndRelease_sends_report_and_release():
+    device = FakeDevice()
+    report = bytes([0x02, 0, 0x04, 0, 0, 0, 0, 0])
+    pressAndRelease(device, report)
+    assert device.reports == [report, bytes(EMPTY_KEYBOARD_REPORT)]
+
+
+def test_sendStrokes_sends_press_and_release_per_stroke():
+    device = FakeDevice()
+    strokes = bytes([0x02, 0x04, 0x00, 0x05, 0x00, 0x06])
+    sendStrokes(device, strokes)
+    assert device.reports == [
+        bytes([0x02, 0, 0x04, 0, 0, 0, 0, 0]),
+        bytes(EMPTY_KEYBOARD_REPORT),
+        bytes([0x00, 0, 0x05, 0, 0, 0, 0, 0]),
+        bytes(EMPTY_KEYBOARD_REPORT),
+        bytes([0x00, 0, 0x06, 0, 0, 0, 0, 0]),
+        bytes(EMPTY_KEYBOARD_REPORT),
+    ]
+
+
+def test_sendStrokes_range():
+    device = FakeDevice()
+    strokes = bytes([0x00, 0x04, 0x00, 0x05, 0x00, 0x06])
+    sendStrokes(device, strokes, start=2, end=4)
+    assert device.reports == [bytes([0x00, 0, 0x05, 0, 0, 0, 0, 0]), bytes(EMPTY_KEYBOARD_REPORT)]
+
+
+def test_sendStrokes_paces_reports(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(hidReports.time, "monotonic_ns", clock)
+    monkeypatch.setattr(hidReports, "lastReportTime", 0)
+    device = FakeDevice(clock)
+    reportInterval = 2000000
+    sendStrokes(device, bytes([0x00, 0x04, 0x00, 0x05]), reportInterval=reportInterval)
+    assert len(device.reports) == 4
+    assert device.times[0] >= reportInterval
+    for previous, current in zip(device.times, device.times[1:]):
+        assert current - previous >= reportInterval
+
+
+def test_countingDevice_calls_onReport_after_sending():
+    device = FakeDevice()
+    sentBefore = []
+    counting = CountingDevice(device, lambda: sentBefore.append(len(device.reports)))
+    pressAndRelease(counting, bytes([0x00, 0, 0x04, 0, 0, 0, 0, 0]))
+    assert sentBefore == [1, 2]
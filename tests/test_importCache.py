@@ -0,0 +1,38 @@
+import pytest
+
+from fd.compiler import compileDuckyScript
+from fd.importCache import ImportCycleError, cachedImport, clearImportCache, resolveImports
+
+
+# loadProgram stand-in compiling payloads from a dict (path => lines)
+def programLoader(payloads):
+    def loadProgram(path, locale):
+        if path not in payloads:
+            raise OSError(path)
+        return compileDuckyScript(payloads[path], locale)[0]
+
+    return loadProgram
+
+
+def test_import_cycle_raises():
+    clearImportCache()
+    loadProgram = programLoader({
+        "a.dd": ["STRING a", "IMPORT b.dd"],
+        "b.dd": ["STRING b", "IMPORT c.dd"],
+        "c.dd": ["STRING c", "IMPORT a.dd"],
+    })
+    with pytest.raises(ImportCycleError) as e:
+        resolveImports(loadProgram("a.dd", "US"), "a.dd", "US", loadProgram)
+    assert e.value.cycle == ["a.dd", "b.dd", "c.dd", "a.dd"]
+    assert str(e.value) == "Import cycle: a.dd -> b.dd -> c.dd -> a.dd"
+
+
+def test_imports_without_cycle_are_cached():
+    clearImportCache()
+    loadProgram = programLoader({
+        "a.dd": ["IMPORT b.dd", "IMPORT b.dd", "IMPORT missing.dd"],
+        "b.dd": ["STRING b"],
+    })
+    resolveImports(loadProgram("a.dd", "US"), "a.dd", "US", loadProgram)
+    assert cachedImport("b.dd", "US") is not None
+    clearImportCache()
@@ -0,0 +1,35 @@
+from fd.compiler import compileDuckyScript
+from fd.payloadCache import loadCompiled, saveCompiled
+
+
+def writeAndCompile(path, lines):
+    f = open(path, "w", encoding="utf-8")
+    f.write("\n".join(lines))
+    f.close()
+    return compileDuckyScript(lines, "US")[0]
+
+
+def test_sidecar_roundtrip_long_delay(tmp_path):
+    # 3 s are 3000000000 ns, beyond a signed 32 bit value
+    path = str(tmp_path / "payload.dd")
+    program = writeAndCompile(path, ["DELAY 3000", "STRING hello", "ENTER"])
+
+    assert saveCompiled(path, "US", program)
+    assert loadCompiled(path, "US") == program
+
+
+def test_sidecar_of_other_locale_is_ignored(tmp_path):
+    path = str(tmp_path / "payload.dd")
+    program = writeAndCompile(path, ["DELAY 10"])
+
+    assert saveCompiled(path, "US", program)
+    assert loadCompiled(path, "DE") is None
+
+
+def test_outdated_sidecar_is_ignored(tmp_path):
+    path = str(tmp_path / "payload.dd")
+    program = writeAndCompile(path, ["DELAY 10"])
+    assert saveCompiled(path, "US", program)
+
+    writeAndCompile(path, ["DELAY 10", "DELAY 20"])
+    assert loadCompiled(path, "US") is None
@@ -0,0 +1,34 @@
+from fd import payloadIndex
+from fd.logger import logSequence
+
+
+def writePayloads(monkeypatch, tmp_path, payloads):
+    for name, content in payloads.items():
+        (tmp_path / name).write_text(content, encoding="utf-8")
+    monkeypatch.setattr(payloadIndex, "PAYLOADS_PATH", str(tmp_path))
+    monkeypatch.setattr(payloadIndex, "INDEX_PATH", str(tmp_path / "payloadIndex.json"))
+    monkeypatch.setattr(payloadIndex, "index", None)
+
+
+def test_estimates_follow_the_settings(monkeypatch, tmp_path):
+    writePayloads(monkeypatch, tmp_path, {"a.dd": "DELAY 100\nSTRING ab\n"})
+    payloadIndex.configureIndex("US", 0, 0, 1000000, True)
+    payloadIndex.refreshIndex()
+    assert payloadIndex.listPayloads()[0]["estimate"] == 104
+
+    # a host profile with a slower report interval (same size and modification time)
+    assert payloadIndex.configureIndex("US", 5000000, 0, 1000000, True)
+    assert payloadIndex.refreshIndex()
+    assert payloadIndex.listPayloads()[0]["estimate"] == 120
+
+    assert not payloadIndex.configureIndex("US", 5000000, 0, 1000000, True)
+    assert not payloadIndex.refreshIndex()
+
+
+def test_indexing_logs_nothing(monkeypatch, tmp_path):
+    writePayloads(monkeypatch, tmp_path, {"a.dd": "STRING ä\nUNKNOWNKEY\n"})
+    payloadIndex.configureIndex("US", 0, 0, 1000000, True)
+    sequence = logSequence()
+    payloadIndex.refreshIndex()
+    assert logSequence() == sequence
+    assert payloadIndex.listPayloads()[0]["lines"] == 2
@@ -0,0 +1,22 @@
+from fd.payloadStorage import COMPLETE_SUFFIX, TEMP_SUFFIX, recoverWrites, writePayload
+
+
+def test_writePayload_replaces_file(tmp_path):
+    path = str(tmp_path / "payload.dd")
+    assert writePayload(path, "STRING old")
+    assert writePayload(path, "STRING new" * 100)
+    assert open(path, encoding="utf-8").read() == "STRING new" * 100
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["payload.dd"]
+
+
+def test_recoverWrites_only_touches_own_files(tmp_path):
+    (tmp_path / "payload.dd").write_text("STRING old")
+    (tmp_path / ("payload.dd" + COMPLETE_SUFFIX)).write_text("STRING new")
+    (tmp_path / ("partial.dd" + TEMP_SUFFIX)).write_text("STRING par")
+    (tmp_path / "notes.new").write_text("someone else's")
+    (tmp_path / "scratch.tmp").write_text("someone else's")
+
+    recoverWrites((str(tmp_path),))
+
+    assert (tmp_path / "payload.dd").read_text() == "STRING new"
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["notes.new", "payload.dd", "scratch.tmp"]
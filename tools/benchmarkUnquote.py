@@ -0,0 +1,84 @@
+# compare the URL decoder against the previous implementation (run on the host, not on the device)
+#  - usage: python tools/benchmarkUnquote.py (from the repository root)
+#  - input is what the web UI used to post: base64 encoded payloads, escaped like encodeURIComponent does
+
+import binascii
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from fd.unquote import unquote
+
+SIZES = (1024, 16 * 1024, 64 * 1024)
+
+
+# previous implementation of fd.unquote.unquote (one string concatenation per character, escape table
+# lookup replaced by unhexlify)
+def legacyUnquoteToBytes(string):
+    if isinstance(string, str):
+        string = string.encode("utf-8")
+    bits = string.split(b"%")
+    if len(bits) == 1:
+        return string
+    res = [bits[0]]
+    for item in bits[1:]:
+        try:
+            res.append(binascii.unhexlify(item[:2]))
+            res.append(item[2:])
+        except (ValueError, binascii.Error):
+            res.append(b"%")
+            res.append(item)
+    return b"".join(res)
+
+
+def legacyUnquote(string, encoding="utf-8", errors="replace"):
+    if "%" not in string:
+        return string
+    current_string = ""
+    str_pos = 0
+    while str_pos < len(string):
+        char = string[str_pos]
+        if char == "%":
+            part = char + string[str_pos + 1] + string[str_pos + 2]
+            current_string = current_string + legacyUnquoteToBytes(part).decode(encoding, errors)
+            str_pos = str_pos + 3
+        else:
+            current_string = current_string + char
+            str_pos = str_pos + 1
+    return current_string
+
+
+# base64 of random payload text, escaped like encodeURIComponent
+def transportEncoded(size):
+    text = "".join(random.choice("STRING abcdefghijklmnopqrstuvwxyz0123456789\n") for _ in range(size))
+    encoded = binascii.b2a_base64(text.encode("utf-8")).decode().strip()
+    return encoded.replace("+", "%2B").replace("/", "%2F").replace("=", "%3D")
+
+
+def measure(function, data, rounds):
+    start = time.perf_counter()
+    for i in range(rounds):
+        result = function(data)
+    return (time.perf_counter() - start) / rounds, result
+
+
+def main():
+    random.seed(0)
+    print(f"{'size':>8} {'previous':>12} {'current':>12} {'speedup':>8}")
+    for size in SIZES:
+        data = transportEncoded(size)
+        rounds = max(1, 256 * 1024 // size)
+        legacyTime, legacyResult = measure(legacyUnquote, data, rounds)
+        currentTime, currentResult = measure(unquote, data, rounds)
+        assert legacyResult == currentResult
+        print(
+            f"{size // 1024:>6}KB {legacyTime * 1000:>10.3f}ms {currentTime * 1000:>10.3f}ms"
+            f" {legacyTime / currentTime:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
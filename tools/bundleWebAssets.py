@@ -0,0 +1,72 @@
+# build minified + gzipped versions of the web UI assets (run on the host, not on the device)
+#  - usage: python tools/bundleWebAssets.py (from the repository root)
+#  - writes fd/web/bundle/*.gz and fd/web/bundle/bundle.json (checksums of the files each bundle was built from)
+#  - re-run after changing files in fd/web/, outdated bundles are ignored by the device
+
+import gzip
+import json
+import os
+import re
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from fd.staticAssets import BUNDLE_MANIFEST, BUNDLE_PATH, assetFiles, checksum
+
+
+# strip indentation, empty lines and full-line comments (line breaks are kept, so JS semantics don't change)
+def minifyLines(text, commentPrefix=None):
+    lines = []
+    for line in text.split("\n"):
+        line = line.strip()
+        if not line or (commentPrefix and line.startswith(commentPrefix)):
+            continue
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def minifyCss(text):
+    text = re.sub(r"/\*.*?\*/", "", text, flags=re.S)
+    text = re.sub(r"\s+", " ", text)
+    text = re.sub(r"\s*([{};:,>])\s*", r"\1", text)
+    return text.replace(";}", "}").strip()
+
+
+def minify(name, text):
+    if name.endswith(".css"):
+        return minifyCss(text)
+    if name.endswith(".js"):
+        return minifyLines(text, "//")
+    return minifyLines(text)
+
+
+def bundleFileName(name):
+    return "index.html.gz" if name == "index" else f"{name}.gz"
+
+
+def main():
+    os.makedirs(BUNDLE_PATH, exist_ok=True)
+    manifest = {}
+
+    for name, (paths, headers) in assetFiles.items():
+        source = b""
+        for path in paths:
+            with open(path, "rb") as f:
+                source += f.read()
+
+        # mtime=0 keeps the output reproducible
+        data = gzip.compress(minify(name, source.decode("utf-8")).encode("utf-8"), 9, mtime=0)
+        path = f"{BUNDLE_PATH}/{bundleFileName(name)}"
+        with open(path, "wb") as f:
+            f.write(data)
+
+        manifest[name] = {"file": path, "source": checksum(source)}
+        print(f"{name}: {len(source)} -> {len(data)} bytes ({path})")
+
+    with open(BUNDLE_MANIFEST, "w") as f:
+        json.dump(manifest, f, indent=4)
+        f.write("\n")
+
+
+if __name__ == "__main__":
+    main()
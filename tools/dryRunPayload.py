@@ -0,0 +1,57 @@
+# dry run of a payload on the host: estimated runtime and everything the compiler couldn't resolve
+#  - usage: python tools/dryRunPayload.py fd/payloads/<payload>.dd [options] (from the repository root, IMPORT
+#    paths are resolved relative to it just like on the device)
+#  - needs adafruit_hid (and the keyboard layouts of the used locales) on the host's python path
+#  - exits with 1 if anything couldn't be resolved
+
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from fd.calibration import HOST_PROFILES_PATH, loadHostProfiles
+from fd.estimator import dryRun
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Estimate the runtime of a duckyscript payload without running it.")
+    parser.add_argument("payload", help="path of the payload (e.g. fd/payloads/example.dd)")
+    parser.add_argument("--locale", default="US", help="keyboard locale (default: US)")
+    parser.add_argument("--report-interval", type=int, default=0, help="minimum time between HID reports (us)")
+    parser.add_argument("--report-time", type=int, default=1000, help="time the host takes to pick up a report (us)")
+    parser.add_argument("--default-delay", type=int, default=0, help="delay after every line (ms)")
+    parser.add_argument("--sequential-combos", action="store_true", help="press key combos one key after another")
+    parser.add_argument("--host-profiles", default=HOST_PROFILES_PATH, help="host profiles (for HOSTPROFILE)")
+    parser.add_argument("--json", action="store_true", help="print the complete report as JSON")
+    args = parser.parse_args()
+
+    settings = {
+        "locale": args.locale,
+        "reportInterval": args.report_interval * 1000,
+        "defaultDelay": args.default_delay,
+        "reportTime": args.report_time * 1000,
+        "singleReportCombos": not args.sequential_combos,
+        "hostProfiles": loadHostProfiles(args.host_profiles),
+    }
+    f = open(args.payload, "r", encoding="utf-8")
+    result = dryRun(f, settings, args.payload)
+    f.close()
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print(f"{result['payload']}: ~{result['estimate'] / 1000} s")
+        print(f"  delays: {result['delays']} ms, input: {result['input']} ms ({result['reports']} HID reports)")
+        print(f"  instructions: {result['instructions']}, imports: {', '.join(result['imports']) or '-'}")
+        for entry in result["untimed"]:
+            print(f"  untimed: {entry['payload']}:{entry['line']} {entry['command']}")
+        for entry in result["unresolved"]:
+            print(f"  unresolved: {entry['payload']}:{entry['line']} {entry['name']}")
+
+    return 1 if result["unresolved"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())